@@ -0,0 +1,445 @@
+"""Offline load test for the bot handlers.
+
+    python bench.py --users 500 --ops 20000 --out bench-results.json
+    python bench.py --compare bench-results.json
+    python bench.py --scoring 100000
+
+Drives the real handlers registered by main.build_app() with synthetic
+updates. The Bot API is replaced by an in-process fake and the database
+by a throwaway SQLite file, so nothing touches the network. Latency is
+measured per handler around Application.process_update. Results are
+written as JSON; --compare prints the change against an earlier run. A
+run compared against bench-results.json is written to
+bench-results-new.json, so the baseline is never overwritten.
+
+--scoring N times the discover scoring engine alone over N synthetic
+users, against the same scoring done one candidate at a time in Python.
+"""
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from telegram.request import BaseRequest
+
+DEFAULT_MIX = "swipe=60,feed=20,post=10,matches=5,profile=5"
+DEFAULT_OUT = "bench-results.json"
+COMPARED_OUT = "bench-results-new.json"
+
+
+# ---------------- FAKE BOT API ----------------
+class FakeRequest(BaseRequest):
+    """Answers Bot API calls locally with plausible results."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = {}
+        self._message_ids = itertools.count(1)
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        name = url.rsplit("/", 1)[-1]
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        params = request_data.parameters if request_data else {}
+        if name == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Bench",
+                      "username": "bench_bot"}
+        elif name in ("sendMessage", "editMessageText"):
+            result = {
+                "message_id": params.get("message_id") or next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+                "text": params.get("text", ""),
+            }
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+# ---------------- SYNTHETIC UPDATES ----------------
+class Updates:
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    def _user(self, user_id):
+        return {"id": user_id, "is_bot": False, "first_name": f"U{user_id}"}
+
+    def message(self, user_id, text):
+        update_id = next(self._ids)
+        message = {
+            "message_id": update_id, "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user(user_id), "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{
+                "type": "bot_command", "offset": 0,
+                "length": len(text.split()[0]),
+            }]
+        return {"update_id": update_id, "message": message}
+
+    def callback(self, user_id, data):
+        update_id = next(self._ids)
+        return {"update_id": update_id, "callback_query": {
+            "id": str(update_id), "from": self._user(user_id),
+            "chat_instance": str(user_id), "data": data,
+            "message": {
+                "message_id": update_id, "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"}, "text": "card",
+            },
+        }}
+
+
+# ---------------- RUNNER ----------------
+class Bench:
+    def __init__(self, app, users, seed):
+        self.app = app
+        self.users = users
+        self.rng = random.Random(seed)
+        self.updates = Updates()
+        self.samples = {}
+        self.max_post_id = 0
+
+    async def send(self, handler, data):
+        from telegram import Update
+
+        update = Update.de_json(data, self.app.bot)
+        start = time.perf_counter()
+        await self.app.process_update(update)
+        elapsed = time.perf_counter() - start
+        self.samples.setdefault(handler, []).append(elapsed)
+
+    async def command(self, user_id, name):
+        await self.send(name, self.updates.message(user_id, f"/{name}"))
+
+    async def text(self, user_id, text):
+        await self.send("handle_text", self.updates.message(user_id, text))
+
+    async def press(self, user_id, data):
+        await self.send("buttons", self.updates.callback(user_id, data))
+
+    async def register(self, user_id):
+        rng = self.rng
+        await self.command(user_id, "start")
+        await self.command(user_id, "profile")
+        await self.text(user_id, ",".join((
+            f"User{user_id}", str(rng.randint(18, 60)),
+            rng.choice(("male", "female", "other")),
+            rng.choice(("Berlin", "Lagos", "Lima", "Oslo", "Pune")),
+            f"likes {rng.choice(('music', 'hiking', 'chess', 'cooking'))}",
+        )))
+
+    async def swipe(self, user_id):
+        await self.command(user_id, "discover")
+        other = self.rng.choice(self.users)
+        action = "dlike" if self.rng.random() < 0.4 else "pass"
+        await self.press(user_id, f"{action}_{other}")
+
+    async def post(self, user_id):
+        await self.command(user_id, "post")
+        await self.text(user_id, f"post from {user_id} #{self.rng.random():.6f}")
+        self.max_post_id += 1
+
+    async def feed(self, user_id):
+        await self.command(user_id, "feed")
+        if self.max_post_id and self.rng.random() < 0.3:
+            cursor = self.rng.randint(1, self.max_post_id)
+            await self.press(user_id, f"feed_older_{cursor}")
+
+    async def matches(self, user_id):
+        await self.command(user_id, "matches")
+
+    async def profile(self, user_id):
+        await self.command(user_id, "profile")
+        await self.text(user_id, f"User{user_id},30,other,Oslo,updated bio")
+
+    async def worker(self, plan):
+        for op, user_id in plan:
+            await getattr(self, op)(user_id)
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("swipe", "feed", "post", "matches", "profile"):
+            raise SystemExit(f"unknown operation in --mix: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(samples, elapsed):
+    handlers = {}
+    for name, values in sorted(samples.items()):
+        ordered = sorted(values)
+        handlers[name] = {
+            "count": len(values),
+            "throughput": len(values) / elapsed,
+            "mean_ms": 1000 * sum(values) / len(values),
+            "p50_ms": 1000 * percentile(ordered, 0.50),
+            "p95_ms": 1000 * percentile(ordered, 0.95),
+            "p99_ms": 1000 * percentile(ordered, 0.99),
+            "max_ms": 1000 * ordered[-1],
+        }
+    total = sum(h["count"] for h in handlers.values())
+    return handlers, {"updates": total, "seconds": elapsed,
+                      "throughput": total / elapsed}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+async def run(args):
+    # The database path is read when main is imported.
+    tmpdir = tempfile.TemporaryDirectory(prefix="meetcircle-bench-")
+    os.environ["BOT_DB"] = os.path.join(tmpdir.name, "bench.db")
+    import main
+    from sender import SendScheduler
+
+    if not args.flood_limits:
+        main.sender = SendScheduler(
+            global_rate=1e9, chat_rate=1e9, chat_burst=1e9
+        )
+    fake = FakeRequest(latency=args.api_latency / 1000)
+    app = main.build_app(request=fake)
+    users = list(range(1000, 1000 + args.users))
+    bench = Bench(app, users, args.seed)
+
+    await app.initialize()
+    try:
+        rng = random.Random(args.seed)
+        mix = parse_mix(args.mix)
+        ops = rng.choices(list(mix), weights=list(mix.values()), k=args.ops)
+        plans = [[] for _ in range(args.concurrency)]
+        for op in ops:
+            user_id = rng.choice(users)
+            # Same user, same lane: keeps each user's updates ordered.
+            plans[user_id % args.concurrency].append((op, user_id))
+
+        start = time.perf_counter()
+        for i in range(0, len(users), args.concurrency):
+            await asyncio.gather(*(
+                bench.register(u) for u in users[i:i + args.concurrency]
+            ))
+        setup = time.perf_counter() - start
+        setup_samples, bench.samples = bench.samples, {}
+
+        start = time.perf_counter()
+        await asyncio.gather(*(bench.worker(plan) for plan in plans))
+        elapsed = time.perf_counter() - start
+        await main.sender.close(timeout=60)
+        drained = time.perf_counter() - start
+    finally:
+        await main.on_stop(app)
+        await app.shutdown()
+        tmpdir.cleanup()
+
+    handlers, total = summarize(bench.samples, elapsed)
+    total["drain_seconds"] = drained
+    total["api_calls"] = fake.calls
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+            "setup_seconds": setup,
+            "setup_handlers": summarize(setup_samples, setup)[0],
+        },
+        "handlers": handlers,
+        "total": total,
+    }
+
+
+# ---------------- SCORING ----------------
+WORDS = ("music", "hiking", "chess", "cooking", "travel", "movies", "books",
+         "running", "yoga", "gaming", "art", "dancing", "coffee", "dogs",
+         "cats", "football", "photography", "science", "poetry", "cycling")
+
+
+def naive_top_k(engine, features, user_id, k, exclude):
+    """The engine's scoring, one candidate at a time."""
+    w = engine.weights
+    age_u, gender_u, location_u, bio_u, liked_u = features[user_id]
+    total = sum(liked_u) + len(liked_u)
+    preference = [(c + 1.0) / total for c in liked_u]
+    scored = []
+    for other, (age, gender, location, bio, _) in features.items():
+        if other == user_id or other in exclude:
+            continue
+        score = 0.0
+        if age_u == age_u and age == age:
+            score += w["age"] * math.exp(-abs(age - age_u) / engine.age_scale)
+        score += w["gender"] * preference[gender]
+        if location_u and location == location_u:
+            score += w["location"]
+        score += w["bio"] * sum(a * b for a, b in zip(bio, bio_u))
+        scored.append((score, other))
+    return [other for _, other in heapq.nlargest(k, scored)]
+
+
+def bench_scoring(args):
+    from scoring import ScoringEngine
+
+    rng = random.Random(args.seed)
+    rows = [
+        (user_id, rng.randint(18, 60),
+         rng.choice(("male", "female", "other")),
+         f"city{rng.randrange(50)}",
+         " ".join(rng.sample(WORDS, rng.randint(2, 6))))
+        for user_id in range(1, args.scoring + 1)
+    ]
+    engine = ScoringEngine(weights={"noise": 0.0}, seed=args.seed)
+    start = time.perf_counter()
+    engine.load(rows)
+    load = time.perf_counter() - start
+    for _ in range(args.scoring):
+        engine.liked(rng.randint(1, args.scoring), rng.randint(1, args.scoring))
+
+    state = engine._state
+    features = {
+        int(user_id): (float(state.age[row]), int(state.gender[row]),
+                       int(state.location[row]), state.bio[row].tolist(),
+                       state.liked_genders[row].tolist())
+        for user_id, row in state.rows.items()
+    }
+    queries = [rng.randint(1, args.scoring) for _ in range(args.queries)]
+    exclude = set(rng.sample(range(1, args.scoring + 1), 200))
+
+    start = time.perf_counter()
+    vectorized = [engine.top_k(u, 50, exclude) for u in queries]
+    fast = (time.perf_counter() - start) / len(queries)
+    naive_queries = queries[:max(1, min(len(queries), args.naive_queries))]
+    start = time.perf_counter()
+    naive = [naive_top_k(engine, features, u, 50, exclude)
+             for u in naive_queries]
+    slow = (time.perf_counter() - start) / len(naive_queries)
+    overlap = sum(
+        len(set(a) & set(b)) / max(1, len(b)) for a, b in zip(vectorized, naive)
+    ) / len(naive)
+    return {
+        "meta": {"commit": git_commit(), "python": platform.python_version(),
+                 "platform": platform.platform(), "args": vars(args)},
+        "scoring": {
+            "users": args.scoring, "load_seconds": load,
+            "vectorized_ms": 1000 * fast, "naive_ms": 1000 * slow,
+            "speedup": slow / fast, "top_k_overlap": overlap,
+        },
+    }
+
+
+def report_scoring(result):
+    s = result["scoring"]
+    print(f"{s['users']} users, loaded in {s['load_seconds']:.2f}s")
+    print(f"vectorized top-50: {s['vectorized_ms']:9.2f} ms/query")
+    print(f"naive loop top-50: {s['naive_ms']:9.2f} ms/query "
+          f"({s['speedup']:.0f}x slower)")
+    print(f"top-50 agreement:  {100 * s['top_k_overlap']:.1f}%")
+
+
+def report(result, baseline=None):
+    print(f"{'handler':<12} {'count':>7} {'ops/s':>9} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'p99 ms':>8}")
+    for name, h in result["handlers"].items():
+        line = (f"{name:<12} {h['count']:>7} {h['throughput']:>9.1f} "
+                f"{h['p50_ms']:>8.2f} {h['p95_ms']:>8.2f} {h['p99_ms']:>8.2f}")
+        old = (baseline or {}).get("handlers", {}).get(name)
+        if old and old["p99_ms"]:
+            change = 100 * (h["p99_ms"] - old["p99_ms"]) / old["p99_ms"]
+            line += f"   p99 {change:+.1f}%"
+        print(line)
+    total = result["total"]
+    print(f"total: {total['updates']} updates in {total['seconds']:.2f}s "
+          f"({total['throughput']:.1f}/s)")
+    if baseline:
+        old = baseline["total"]["throughput"]
+        print(f"throughput vs {baseline['meta'].get('commit')}: "
+              f"{100 * (total['throughput'] - old) / old:+.1f}%")
+
+
+def _same_file(a, b):
+    return os.path.realpath(a) == os.path.realpath(b)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--ops", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help=f"operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--api-latency", type=float, default=0.0,
+                        help="simulated Bot API round trip in ms")
+    parser.add_argument("--flood-limits", action="store_true",
+                        help="keep Telegram's send rate limits")
+    parser.add_argument("--out", help=f"results file (default: {DEFAULT_OUT},"
+                        f" or {COMPARED_OUT} when comparing against it)")
+    parser.add_argument("--compare", metavar="JSON",
+                        help="earlier results to compare against")
+    parser.add_argument("--scoring", type=int, metavar="USERS",
+                        help="benchmark the scoring engine instead")
+    parser.add_argument("--queries", type=int, default=100,
+                        help="scoring queries to time (with --scoring)")
+    parser.add_argument("--naive-queries", type=int, default=5,
+                        help="of those, how many to run naively")
+    args = parser.parse_args()
+    if args.out is None:
+        args.out = DEFAULT_OUT
+        if args.compare and _same_file(args.compare, DEFAULT_OUT):
+            args.out = COMPARED_OUT
+    elif args.compare and _same_file(args.compare, args.out):
+        parser.error("--out would overwrite the --compare baseline")
+
+    if args.scoring:
+        result = bench_scoring(args)
+        report_scoring(result)
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"results written to {args.out}", file=sys.stderr)
+        return
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    result = asyncio.run(run(args))
+    report(result, baseline)
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"results written to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+import os
+
+TOKEN = os.environ.get("BOT_TOKEN", "YOUR_BOT_TOKEN")
+# Point this at a local stand-in for the Bot API when testing.
+API_URL = os.environ.get("BOT_API_URL", "https://api.telegram.org/bot")
+DB_PATH = os.environ.get("BOT_DB", "bot.db")
+# Serve /metrics on 127.0.0.1:METRICS_PORT when set.
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0")) or None
+# Log statements slower than this; a negative value turns the log off.
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "50"))
@@ -0,0 +1,274 @@
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import metrics
+import migrations
+
+
+# ---------------- CONNECTIONS ----------------
+class Database:
+    """SQLite behind a bounded thread pool.
+
+    Every pool thread lazily opens its own connection, so statements never
+    run on the event loop and no cursor is ever shared between handlers.
+    """
+
+    def __init__(self, path, max_workers=4, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="db"
+        )
+
+    def connect(self):
+        # sqlite3 keeps a per-connection cache of prepared statements keyed
+        # by SQL text, so the constant queries below are compiled only once.
+        conn = sqlite3.connect(
+            self.path, timeout=self.timeout,
+            check_same_thread=False, cached_statements=256,
+            factory=metrics.InstrumentedConnection
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def migrate(self):
+        conn = self.connect()
+        try:
+            return migrations.migrate(conn)
+        finally:
+            conn.close()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self.connect()
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _call(self, fn, args):
+        conn = self._connection()
+        with conn:
+            return fn(conn, *args)
+
+    async def run(self, fn, *args):
+        """Run ``fn(conn, *args)`` in one transaction on a pool thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, self._call, fn, args)
+
+    async def execute(self, sql, params=()):
+        return await self.run(lambda conn: conn.execute(sql, params).lastrowid)
+
+    async def fetchone(self, sql, params=()):
+        return await self.run(lambda conn: conn.execute(sql, params).fetchone())
+
+    async def fetchall(self, sql, params=()):
+        return await self.run(lambda conn: conn.execute(sql, params).fetchall())
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+
+# ---------------- REPOSITORY ----------------
+MIN_ID = -(2 ** 63)
+MAX_ID = 2 ** 63 - 1
+
+CREATE_USER = "INSERT OR IGNORE INTO users (user_id) VALUES (?)"
+UPDATE_PROFILE = """
+    UPDATE users SET name=?, age=?, gender=?, location=?, bio=?
+    WHERE user_id=?
+"""
+INSERT_POST = "INSERT INTO posts (user_id, content, timestamp) VALUES (?,?,?)"
+POSTS_BEFORE = """
+    SELECT post_id, user_id, content FROM posts
+    WHERE post_id < ? ORDER BY post_id DESC LIMIT ?
+"""
+POSTS_AFTER = """
+    SELECT post_id, user_id, content FROM posts
+    WHERE post_id > ? ORDER BY post_id ASC LIMIT ?
+"""
+LIKE_POST = "INSERT OR IGNORE INTO likes (user_id, post_id) VALUES (?,?)"
+# Filled with one "?" per id; PROFILE_CHUNK stays under SQLite's
+# default limit on bound parameters.
+GET_PROFILES = """
+    SELECT user_id, name, age, gender, location, bio FROM users
+    WHERE user_id IN ({})
+"""
+PROFILE_CHUNK = 500
+USER_ID_BOUNDS = "SELECT min(user_id), max(user_id) FROM users"
+DECK_CANDIDATES = """
+    SELECT u.user_id FROM users AS u
+    WHERE u.user_id > ? AND u.user_id < ? AND u.user_id != ?
+      AND u.name IS NOT NULL
+      AND NOT EXISTS (
+          SELECT 1 FROM dating_likes
+          WHERE liker_id=? AND liked_id=u.user_id)
+      AND NOT EXISTS (
+          SELECT 1 FROM dating_passes
+          WHERE passer_id=? AND passed_id=u.user_id)
+    ORDER BY u.user_id LIMIT ?
+"""
+INSERT_PASS = """
+    INSERT OR IGNORE INTO dating_passes (passer_id, passed_id) VALUES (?,?)
+"""
+INSERT_LIKE = """
+    INSERT OR IGNORE INTO dating_likes (liker_id, liked_id) VALUES (?,?)
+"""
+LIKED_BY = "SELECT 1 FROM dating_likes WHERE liker_id=? AND liked_id=?"
+INSERT_MATCH = "INSERT OR IGNORE INTO matches (user_lo, user_hi) VALUES (?,?)"
+SWIPED = """
+    SELECT liked_id FROM dating_likes WHERE liker_id=?
+    UNION ALL
+    SELECT passed_id FROM dating_passes WHERE passer_id=?
+"""
+SCORING_PROFILES = """
+    SELECT user_id, age, gender, location, bio, name IS NOT NULL FROM users
+"""
+LIKED_GENDERS = """
+    SELECT l.liker_id, u.gender, count(*)
+    FROM dating_likes AS l JOIN users AS u ON u.user_id = l.liked_id
+    GROUP BY l.liker_id, u.gender
+"""
+# Keyset pagination over (rank, rowid): rank is bm25(), lower is better.
+SEARCH_POSTS = """
+    SELECT f.rowid, f.rank, p.user_id,
+           snippet(posts_fts, 0, '', '', '…', 24)
+    FROM posts_fts AS f JOIN posts AS p ON p.post_id = f.rowid
+    WHERE posts_fts MATCH ? AND (f.rank > ? OR (f.rank = ? AND f.rowid > ?))
+    ORDER BY f.rank, f.rowid LIMIT ?
+"""
+SEARCH_PEOPLE = """
+    SELECT rowid, rank FROM users_fts
+    WHERE users_fts MATCH ? AND (rank > ? OR (rank = ? AND rowid > ?))
+    ORDER BY rank, rowid LIMIT ?
+"""
+USER_MATCHES = """
+    SELECT user_hi FROM matches WHERE user_lo=?
+    UNION ALL
+    SELECT user_lo FROM matches WHERE user_hi=?
+"""
+
+
+class Repository:
+    """Awaitable data-access API used by the handlers.
+
+    Reads go to the database's thread pool; writes are queued on the
+    write-behind writer and awaited until their batch has committed.
+    """
+
+    def __init__(self, db, writer):
+        self.db = db
+        self.writer = writer
+
+    async def create_user(self, user_id):
+        await self.writer.execute(CREATE_USER, (user_id,))
+
+    async def update_profile(self, user_id, name, age, gender, location, bio):
+        """Return True if the user exists and was updated."""
+        def update(conn):
+            params = (name, age, gender, location, bio, user_id)
+            return conn.execute(UPDATE_PROFILE, params).rowcount == 1
+
+        return await self.writer.run(update)
+
+    async def add_post(self, user_id, content):
+        return await self.writer.execute(
+            INSERT_POST, (user_id, content, datetime.now().isoformat())
+        )
+
+    async def posts_before(self, before=None, limit=5):
+        """Newest-first posts with post_id < ``before`` (all when None)."""
+        before = MAX_ID if before is None else before
+        return await self.db.fetchall(POSTS_BEFORE, (before, limit))
+
+    async def posts_after(self, after, limit=5):
+        """Oldest-first posts with post_id > ``after``."""
+        return await self.db.fetchall(POSTS_AFTER, (after, limit))
+
+    async def like_post(self, user_id, post_id):
+        await self.writer.execute(LIKE_POST, (user_id, post_id))
+
+    async def profiles(self, user_ids):
+        """Profile rows for whichever of ``user_ids`` exist, in any order."""
+        def load(conn):
+            rows = []
+            for i in range(0, len(user_ids), PROFILE_CHUNK):
+                chunk = user_ids[i:i + PROFILE_CHUNK]
+                sql = GET_PROFILES.format(",".join("?" * len(chunk)))
+                rows.extend(conn.execute(sql, chunk).fetchall())
+            return rows
+
+        return await self.db.run(load)
+
+    async def user_id_bounds(self):
+        return await self.db.fetchone(USER_ID_BOUNDS)
+
+    async def deck_candidates(self, user_id, after=None, before=None, limit=50):
+        """Ids in (after, before) that ``user_id`` has neither liked nor passed."""
+        after = MIN_ID if after is None else after
+        before = MAX_ID if before is None else before
+        rows = await self.db.fetchall(
+            DECK_CANDIDATES,
+            (after, before, user_id, user_id, user_id, limit)
+        )
+        return [uid for uid, in rows]
+
+    async def swiped_ids(self, user_id):
+        """Everyone ``user_id`` has already liked or passed."""
+        rows = await self.db.fetchall(SWIPED, (user_id, user_id))
+        return {other for other, in rows}
+
+    async def scoring_rows(self):
+        """Profile rows and per-gender like counts for the scoring engine."""
+        def load(conn):
+            return (conn.execute(SCORING_PROFILES).fetchall(),
+                    conn.execute(LIKED_GENDERS).fetchall())
+
+        return await self.db.run(load)
+
+    async def pass_user(self, passer_id, passed_id):
+        await self.writer.execute(INSERT_PASS, (passer_id, passed_id))
+
+    async def like_user(self, liker_id, liked_id):
+        """Record a dating like; return ``(new_like, new_match)``."""
+        def like(conn):
+            new = conn.execute(INSERT_LIKE, (liker_id, liked_id)).rowcount == 1
+            if conn.execute(LIKED_BY, (liked_id, liker_id)).fetchone() is None:
+                return new, False
+            pair = (min(liker_id, liked_id), max(liker_id, liked_id))
+            return new, conn.execute(INSERT_MATCH, pair).rowcount == 1
+
+        if liker_id == liked_id:
+            return False, False
+
+        return await self.writer.run(like)
+
+    async def search_posts(self, match, after=None, limit=5):
+        """``(post_id, rank, user_id, snippet)`` rows for an FTS5 query,
+        best first, starting after the ``(rank, post_id)`` cursor."""
+        rank, rowid = after or (float("-inf"), MIN_ID)
+        return await self.db.fetchall(
+            SEARCH_POSTS, (match, rank, rank, rowid, limit)
+        )
+
+    async def search_people(self, match, after=None, limit=5):
+        """``(user_id, rank)`` rows whose bio matches, best first."""
+        rank, rowid = after or (float("-inf"), MIN_ID)
+        return await self.db.fetchall(
+            SEARCH_PEOPLE, (match, rank, rank, rowid, limit)
+        )
+
+    async def match_ids(self, user_id):
+        rows = await self.db.fetchall(USER_MATCHES, (user_id, user_id))
+        return [other for other, in rows]
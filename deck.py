@@ -0,0 +1,135 @@
+import asyncio
+import random
+from collections import OrderedDict, deque
+
+
+class _Deck:
+    __slots__ = ("queue", "queued", "pivot", "cursor", "wrapped",
+                 "exhausted", "refill")
+
+    def __init__(self):
+        self.queue = deque()
+        self.queued = set()
+        self.refill = None
+        self.reset(None)
+
+    def reset(self, pivot):
+        self.queued.clear()
+        self.pivot = pivot
+        self.cursor = None
+        self.wrapped = False
+        self.exhausted = False
+
+
+class DiscoverDeck:
+    """Per-user queues of discover candidates.
+
+    Candidates are read in id order starting from a random pivot, one
+    batch at a time, skipping anyone the user already liked or passed.
+    Each batch is shuffled into the queue, so a swipe is a deque pop and
+    the next batch is fetched in the background while the deck runs low.
+    With a profile cache, each batch's profiles are loaded along with it,
+    so showing a card doesn't need a query of its own. With a scoring
+    engine, batches are the best-scoring candidates instead, best first.
+    """
+
+    def __init__(self, repo, profiles=None, scorer=None, batch_size=50,
+                 low_water=10, max_decks=10000):
+        self.repo = repo
+        self.profiles = profiles
+        self.scorer = scorer
+        self.batch_size = batch_size
+        self.low_water = low_water
+        self.max_decks = max_decks
+        self._decks = OrderedDict()
+
+    def _deck(self, user_id):
+        deck = self._decks.get(user_id)
+        if deck is None:
+            deck = self._decks[user_id] = _Deck()
+            while len(self._decks) > self.max_decks:
+                self._decks.popitem(last=False)
+        else:
+            self._decks.move_to_end(user_id)
+        return deck
+
+    async def next(self, user_id):
+        """Pop the next candidate id for ``user_id``, or None if none are left."""
+        deck = self._deck(user_id)
+        if not deck.queue:
+            await self._refill_now(user_id, deck)
+            if not deck.queue and deck.exhausted:
+                # Start a new pass to pick up users who joined since.
+                deck.reset(None)
+                await self._refill_now(user_id, deck)
+        if not deck.queue:
+            return None
+
+        candidate = deck.queue.popleft()
+        if (len(deck.queue) < self.low_water and not deck.exhausted
+                and deck.refill is None):
+            deck.refill = asyncio.create_task(self._refill(user_id, deck))
+        return candidate
+
+    async def _refill_now(self, user_id, deck):
+        if deck.refill is None:
+            deck.refill = asyncio.ensure_future(self._refill(user_id, deck))
+        await deck.refill
+
+    async def _refill(self, user_id, deck):
+        try:
+            if self.scorer is not None:
+                await self._refill_scored(user_id, deck)
+            else:
+                await self._refill_scan(user_id, deck)
+        finally:
+            deck.refill = None
+
+    async def _refill_scored(self, user_id, deck):
+        if deck.exhausted:
+            return
+        exclude = await self.repo.swiped_ids(user_id) | deck.queued
+        loop = asyncio.get_running_loop()
+        ids = await loop.run_in_executor(
+            None, self.scorer.top_k, user_id, self.batch_size, exclude
+        )
+        if len(ids) < self.batch_size:
+            deck.exhausted = True
+        if ids:
+            if self.profiles is not None:
+                await self.profiles.get_many(ids)
+            deck.queued.update(ids)
+            deck.queue.extend(ids)
+
+    async def _refill_scan(self, user_id, deck):
+        while not deck.exhausted:
+            if deck.pivot is None:
+                bounds = await self.repo.user_id_bounds()
+                if bounds[0] is None:
+                    deck.exhausted = True
+                    break
+                deck.pivot = random.randint(*bounds)
+                deck.cursor = deck.pivot - 1
+
+            # First pass reads [pivot, max], then wraps around to [min, pivot).
+            upper = deck.pivot if deck.wrapped else None
+            ids = await self.repo.deck_candidates(
+                user_id, deck.cursor, upper, self.batch_size
+            )
+            if ids:
+                deck.cursor = ids[-1]
+            if len(ids) < self.batch_size:
+                if deck.wrapped:
+                    deck.exhausted = True
+                else:
+                    deck.wrapped = True
+                    deck.cursor = None
+            if ids:
+                fresh = [i for i in ids if i not in deck.queued]
+                if self.profiles is not None:
+                    await self.profiles.get_many(fresh)
+                random.shuffle(fresh)
+                deck.queued.update(fresh)
+                deck.queue.extend(fresh)
+            if deck.queue:
+                break
@@ -0,0 +1,96 @@
+from time import monotonic
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from profiles import Profile
+
+MAX_POST_CHARS = 600
+
+
+class Feed:
+    """Keyset-paginated post feed rendered as one message per page.
+
+    Pages are addressed by post_id cursors carried in the Older/Newer
+    callback data, so paging never uses OFFSET. The newest page is the
+    one nearly every /feed asks for; it is kept rendered in memory until
+    invalidate() is called by a write that changes it. When other
+    processes write to the same database, ``max_age`` bounds how long a
+    cached page can miss their posts. Author names come from the profile
+    cache, one batched lookup per page.
+    """
+
+    def __init__(self, repo, profiles, page_size=5, max_age=None):
+        self.repo = repo
+        self.profiles = profiles
+        self.page_size = page_size
+        self.max_age = max_age
+        self._latest = None
+        self._cached_at = 0.0
+        self._generation = 0
+
+    def invalidate(self):
+        self._generation += 1
+        self._latest = None
+
+    async def page(self, older_than=None, newer_than=None):
+        """Return ``(text, reply_markup)`` for a page, or None if there are no posts."""
+        if newer_than is not None:
+            rows = await self.repo.posts_after(newer_than, self.page_size + 1)
+            if len(rows) > self.page_size:
+                rows = rows[:self.page_size]
+                return await self._render(
+                    rows[::-1], has_older=True, has_newer=True
+                )
+            # Nothing newer than a full page away: that is the latest page.
+
+        elif older_than is not None:
+            rows = await self.repo.posts_before(older_than, self.page_size + 1)
+            if not rows:
+                return None
+            has_older = len(rows) > self.page_size
+            return await self._render(
+                rows[:self.page_size], has_older=has_older, has_newer=True
+            )
+
+        if self._latest is not None and self.max_age is not None:
+            if monotonic() - self._cached_at > self.max_age:
+                self._latest = None
+        if self._latest is None:
+            generation = self._generation
+            rows = await self.repo.posts_before(None, self.page_size + 1)
+            if not rows:
+                return None
+            latest = await self._render(
+                rows[:self.page_size],
+                has_older=len(rows) > self.page_size, has_newer=False
+            )
+            if generation != self._generation:
+                return latest
+            self._latest = latest
+            self._cached_at = monotonic()
+        return self._latest
+
+    async def _render(self, rows, has_older, has_newer):
+        authors = await self.profiles.get_many([uid for _, uid, _ in rows])
+        parts = []
+        likes = []
+        for n, (pid, uid, content) in enumerate(rows, 1):
+            if len(content) > MAX_POST_CHARS:
+                content = content[:MAX_POST_CHARS - 1] + "…"
+            name = (authors.get(uid) or Profile(uid)).display_name
+            parts.append(f"{n}. {name}:\n{content}")
+            likes.append(InlineKeyboardButton(f"Like {n}", callback_data=f"like_{pid}"))
+
+        keyboard = [likes]
+        nav = []
+        if has_newer:
+            nav.append(InlineKeyboardButton(
+                "Newer", callback_data=f"feed_newer_{rows[0][0]}"
+            ))
+        if has_older:
+            nav.append(InlineKeyboardButton(
+                "Older", callback_data=f"feed_older_{rows[-1][0]}"
+            ))
+        if nav:
+            keyboard.append(nav)
+        return "\n\n".join(parts), InlineKeyboardMarkup(keyboard)
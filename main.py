@@ -1,147 +1,164 @@
-Telegram Social + Dating Bot (School Project – Starter Version)from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+"""Telegram Social + Dating Bot (School Project – Starter Version)"""
+import asyncio
+import logging
+
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
-    ApplicationBuilder, CommandHandler, ContextTypes,
+    ApplicationBuilder, ContextTypes,
     MessageHandler, CallbackQueryHandler, filters
 )
-import sqlite3
-from datetime import datetime
+import config
+import metrics
+from db import Database, Repository
+from deck import DiscoverDeck
+from feed import Feed
+from metrics import MetricsServer
+from processing import UserOrderedProcessor
+from profiles import Profile, ProfileCache
+from router import CommandRouter
+from search import PEOPLE, POSTS, Search, save_query, saved_query
+from sender import NOTIFICATION, SendScheduler
+from writer import WriteBehind
+
+try:
+    from scoring import ScoringEngine
+except ImportError:  # NumPy missing: discover falls back to random order.
+    ScoringEngine = None
+
+logger = logging.getLogger(__name__)
 
 # ---------------- DATABASE ----------------
-conn = sqlite3.connect("bot.db", check_same_thread=False)
-cursor = conn.cursor()
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS users (
-    user_id INTEGER PRIMARY KEY,
-    name TEXT,
-    age INTEGER,
-    gender TEXT,
-    location TEXT,
-    bio TEXT
-)
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS posts (
-    post_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER,
-    content TEXT,
-    timestamp TEXT
-)
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS dating_likes (
-    liker_id INTEGER,
-    liked_id INTEGER
-)
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS matches (
-    user1 INTEGER,
-    user2 INTEGER
-)
-""")
-
-conn.commit()
-
-# ---------------- HELPERS ----------------
-def user_exists(user_id):
-    cursor.execute("SELECT 1 FROM users WHERE user_id=?", (user_id,))
-    return cursor.fetchone() is not None
+db = Database(config.DB_PATH)
+db.migrate()
+writer = WriteBehind(db)
+repo = Repository(db, writer)
+profiles = ProfileCache(repo)
+scorer = ScoringEngine() if ScoringEngine else None
+deck = DiscoverDeck(repo, profiles, scorer)
+sender = SendScheduler()
+news_feed = Feed(repo, profiles)
+searcher = Search(repo, profiles)
 
 # ---------------- COMMANDS ----------------
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    if not user_exists(user_id):
-        cursor.execute("INSERT INTO users (user_id) VALUES (?)", (user_id,))
-        conn.commit()
-        await update.message.reply_text(
-            "Welcome! Set your profile using:\n/profile"
+    if not await profiles.exists(user_id):
+        await repo.create_user(user_id)
+        profiles.put(Profile(user_id))
+        if scorer is not None:
+            scorer.upsert(user_id, listed=False)
+        sender.reply(
+            update.message, "Welcome! Set your profile using:\n/profile"
         )
     else:
-        await update.message.reply_text("Welcome back. Use /menu")
+        sender.reply(update.message, "Welcome back. Use /menu")
 
 async def menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(
+    sender.reply(
+        update.message,
         "/profile – Edit profile\n"
         "/post – Create post\n"
         "/feed – View feed\n"
         "/discover – Dating\n"
-        "/matches – View matches"
+        "/matches – View matches\n"
+        "/search – Search posts\n"
+        "/find – Find people by bio"
     )
 
 async def profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data["edit_profile"] = True
-    await update.message.reply_text(
-        "Send profile as:\nName,Age,Gender,Location,Bio"
+    sender.reply(
+        update.message, "Send profile as:\nName,Age,Gender,Location,Bio"
     )
 
 async def post(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data["posting"] = True
-    await update.message.reply_text("Send post text")
+    sender.reply(update.message, "Send post text")
 
 async def feed(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    cursor.execute("""
-        SELECT posts.post_id, users.name, posts.content
-        FROM posts JOIN users ON posts.user_id = users.user_id
-        ORDER BY posts.post_id DESC LIMIT 5
-    """)
-    rows = cursor.fetchall()
-
-    if not rows:
-        await update.message.reply_text("No posts yet")
-        return
+    page = await news_feed.page()
 
-    for pid, name, content in rows:
-        keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton("Like", callback_data=f"like_{pid}")]
-        ])
-        await update.message.reply_text(
-            f"{name}:\n{content}", reply_markup=keyboard
-        )
+    if not page:
+        sender.reply(update.message, "No posts yet")
+        return
 
-async def discover(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = update.effective_user.id
-    cursor.execute("""
-        SELECT user_id, name, age, bio
-        FROM users WHERE user_id != ?
-        ORDER BY RANDOM() LIMIT 1
-    """, (user_id,))
-    row = cursor.fetchone()
-
-    if not row:
-        await update.message.reply_text("No users found")
+    text, keyboard = page
+    sender.reply(update.message, text, reply_markup=keyboard)
+
+async def send_card(message, user_id):
+    # The deck can offer someone this process has cached as unknown, e.g.
+    # a user another worker just created; move on to the next candidate.
+    card = None
+    seen = set()
+    while card is None:
+        candidate = await deck.next(user_id)
+        if candidate is None or candidate in seen:
+            break
+        seen.add(candidate)
+        card = await profiles.get(candidate)
+
+    if not card:
+        sender.reply(message, "No users found")
         return
 
-    uid, name, age, bio = row
+    uid = card.user_id
     keyboard = InlineKeyboardMarkup([
         [
             InlineKeyboardButton("Like", callback_data=f"dlike_{uid}"),
-            InlineKeyboardButton("Pass", callback_data="pass")
+            InlineKeyboardButton("Pass", callback_data=f"pass_{uid}")
         ]
     ])
-    await update.message.reply_text(
-        f"{name}, {age}\n{bio}", reply_markup=keyboard
-    )
+    text = card.display_name
+    if card.age is not None:
+        text += f", {card.age}"
+    if card.bio:
+        text += f"\n{card.bio}"
+    sender.reply(message, text, reply_markup=keyboard)
+
+async def discover(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await send_card(update.message, update.effective_user.id)
 
 async def matches(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    cursor.execute("""
-        SELECT user1, user2 FROM matches
-        WHERE user1=? OR user2=?
-    """, (user_id, user_id))
-    rows = cursor.fetchall()
-
-    if not rows:
-        await update.message.reply_text("No matches yet")
+    match_ids = await repo.match_ids(user_id)
+
+    if not match_ids:
+        sender.reply(update.message, "No matches yet")
         return
 
+    found = await profiles.get_many(match_ids)
     msg = "Your matches:\n"
-    for u1, u2 in rows:
-        msg += f"- User {u2 if u1 == user_id else u1}\n"
-    await update.message.reply_text(msg)
+    for other in match_ids:
+        card = found.get(other) or Profile(other)
+        msg += f"- {card.display_name}"
+        if card.age is not None:
+            msg += f", {card.age}"
+        msg += "\n"
+    sender.reply(update.message, msg)
+
+async def send_results(message, context, kind, text):
+    query_id = save_query(context.user_data, kind, text)
+    page = await searcher.page(kind, text, query_id=query_id)
+
+    if not page:
+        sender.reply(message, "No results")
+        return
+
+    text, keyboard = page
+    sender.reply(message, text, reply_markup=keyboard)
+
+async def start_search(update, context, kind):
+    if context.args:
+        await send_results(update.message, context, kind, " ".join(context.args))
+        return
+    context.user_data["searching"] = kind
+    sender.reply(update.message, "Send search terms")
+
+async def search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await start_search(update, context, POSTS)
+
+async def find(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await start_search(update, context, PEOPLE)
 
 # ---------------- TEXT HANDLER ----------------
 async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -151,187 +168,220 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if context.user_data.get("edit_profile"):
         try:
             name, age, gender, location, bio = text.split(",")
-            cursor.execute("""
-                UPDATE users SET name=?, age=?, gender=?, location=?, bio=?
-                WHERE user_id=?
-            """, (name, int(age), gender, location, bio, user_id))
-            conn.commit()
-            context.user_data["edit_profile"] = False
-            await update.message.reply_text("Profile updated")
-        except:
-            await update.message.reply_text("Invalid format")
+            age = int(age)
+        except ValueError:
+            sender.reply(update.message, "Invalid format")
+            return
+        if await repo.update_profile(user_id, name, age, gender, location, bio):
+            profiles.put(Profile(user_id, name, age, gender, location, bio))
+            if scorer is not None:
+                scorer.upsert(user_id, age, gender, location, bio)
+        news_feed.invalidate()
+        searcher.invalidate(PEOPLE)
+        context.user_data["edit_profile"] = False
+        sender.reply(update.message, "Profile updated")
         return
 
     if context.user_data.get("posting"):
-        cursor.execute("""
-            INSERT INTO posts (user_id, content, timestamp)
-            VALUES (?,?,?)
-        """, (user_id, text, datetime.now().isoformat()))
-        conn.commit()
+        await repo.add_post(user_id, text)
+        news_feed.invalidate()
+        searcher.invalidate(POSTS)
         context.user_data["posting"] = False
-        await update.message.reply_text("Post published")
+        sender.reply(update.message, "Post published")
+        return
+
+    kind = context.user_data.get("searching")
+    if kind:
+        context.user_data["searching"] = None
+        await send_results(update.message, context, kind, text)
 
 # ---------------- BUTTONS ----------------
 async def buttons(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
-    await query.answer()
     user_id = query.from_user.id
 
-    if query.data.startswith("dlike_"):
-        liked_id = int(query.data.split("_")[1])
-        cursor.execute(
-            "INSERT INTO dating_likes VALUES (?,?)",
-            (user_id, liked_id)
-        )
-        cursor.execute("""
-            SELECT 1 FROM dating_likes
-            WHERE liker_id=? AND liked_id=?
-        """, (liked_id, user_id))
-
-        if cursor.fetchone():
-            cursor.execute(
-                "INSERT INTO matches VALUES (?,?)",
-                (user_id, liked_id)
-            )
-            conn.commit()
-            await query.message.reply_text("It's a match!")
-
-# ---------------- MAIN ----------------
-app = ApplicationBuilder().token("YOUR_BOT_TOKEN").build()
-
-app.add_handler(CommandHandler("start", start))
-app.add_handler(CommandHandler("menu", menu))
-app.add_handler(CommandHandler("profile", profile))
-app.add_handler(CommandHandler("post", post))
-app.add_handler(CommandHandler("feed", feed))
-app.add_handler(CommandHandler("discover", discover))
-app.add_handler(CommandHandler("matches", matches))
-app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
-app.add_handler(CallbackQueryHandler(buttons))
-
-app.run_polling()
-
-Features included:
-
-- User registration & profile
-
-- Social posts & feed
-
-- Dating discover & match logic (basic)
-
-NOTE: This is a COMPLETE FOUNDATION, not production-ready.
-
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, MessageHandler, filters import sqlite3 from datetime import datetime
-
----------------- DATABASE SETUP ----------------
-
-conn = sqlite3.connect('bot.db', check_same_thread=False) cursor = conn.cursor()
-
-cursor.execute('''CREATE TABLE IF NOT EXISTS users ( user_id INTEGER PRIMARY KEY, name TEXT, age INTEGER, gender TEXT, location TEXT, bio TEXT )''')
-
-cursor.execute('''CREATE TABLE IF NOT EXISTS posts ( post_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, content TEXT, timestamp TEXT )''')
-
-cursor.execute('''CREATE TABLE IF NOT EXISTS likes ( user_id INTEGER, post_id INTEGER )''')
-
-cursor.execute('''CREATE TABLE IF NOT EXISTS dating_likes ( liker_id INTEGER, liked_id INTEGER )''')
-
-cursor.execute('''CREATE TABLE IF NOT EXISTS matches ( user1 INTEGER, user2 INTEGER )''')
-
-conn.commit()
-
----------------- HELPERS ----------------
-
-def user_exists(user_id): cursor.execute('SELECT * FROM users WHERE user_id=?', (user_id,)) return cursor.fetchone() is not None
-
----------------- COMMANDS ----------------
-
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE): user_id = update.effective_user.id if user_exists(user_id): await update.message.reply_text("Welcome back. Use /menu") else: cursor.execute('INSERT INTO users (user_id) VALUES (?)', (user_id,)) conn.commit() await update.message.reply_text("Welcome. Set your profile using /profile")
-
-async def menu(update: Update, context: ContextTypes.DEFAULT_TYPE): await update.message.reply_text( "Main Menu:\n" "/profile – Edit profile\n" "/post – Create post\n" "/feed – View feed\n" "/discover – Dating discover\n" "/matches – View matches" )
-
-async def profile(update: Update, context: ContextTypes.DEFAULT_TYPE): await update.message.reply_text( "Send profile as:\n" "Name,Age,Gender,Location,Bio" ) context.user_data['editing_profile'] = True
-
-async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE): user_id = update.effective_user.id text = update.message.text
-
-if context.user_data.get('editing_profile'):
-    try:
-        name, age, gender, location, bio = text.split(',')
-        cursor.execute('''UPDATE users SET name=?, age=?, gender=?, location=?, bio=?
-                          WHERE user_id=?''',
-                       (name, int(age), gender, location, bio, user_id))
-        conn.commit()
-        context.user_data['editing_profile'] = False
-        await update.message.reply_text("Profile updated successfully")
-    except:
-        await update.message.reply_text("Invalid format. Try again")
-    return
-
-if context.user_data.get('posting'):
-    cursor.execute('INSERT INTO posts (user_id, content, timestamp) VALUES (?,?,?)',
-                   (user_id, text, datetime.now().isoformat()))
-    conn.commit()
-    context.user_data['posting'] = False
-    await update.message.reply_text("Post published")
-
-async def post(update: Update, context: ContextTypes.DEFAULT_TYPE): await update.message.reply_text("Send post text") context.user_data['posting'] = True
-
-async def feed(update: Update, context: ContextTypes.DEFAULT_TYPE): cursor.execute('''SELECT posts.post_id, users.name, posts.content FROM posts JOIN users ON posts.user_id = users.user_id ORDER BY posts.post_id DESC LIMIT 5''') rows = cursor.fetchall()
-
-if not rows:
-    await update.message.reply_text("No posts yet")
-    return
-
-for post_id, name, content in rows:
-    keyboard = InlineKeyboardMarkup([
-        [InlineKeyboardButton("Like", callback_data=f"like_{post_id}")]
-    ])
-    await update.message.reply_text(f"{name}:\n{content}", reply_markup=keyboard)
-
-async def discover(update: Update, context: ContextTypes.DEFAULT_TYPE): user_id = update.effective_user.id cursor.execute('''SELECT user_id, name, age, bio FROM users WHERE user_id != ? ORDER BY RANDOM() LIMIT 1''', (user_id,)) row = cursor.fetchone()
-
-if not row:
-    await update.message.reply_text("No users found")
-    return
-
-uid, name, age, bio = row
-keyboard = InlineKeyboardMarkup([
-    [InlineKeyboardButton("Like", callback_data=f"dlike_{uid}"),
-     InlineKeyboardButton("Pass", callback_data="pass")]
-])
-await update.message.reply_text(f"{name}, {age}\n{bio}", reply_markup=keyboard)
-
-async def matches(update: Update, context: ContextTypes.DEFAULT_TYPE): user_id = update.effective_user.id cursor.execute('''SELECT user1, user2 FROM matches WHERE user1=? OR user2=?''', (user_id, user_id)) rows = cursor.fetchall()
+    if query.data.startswith("like_"):
+        await repo.like_post(user_id, int(query.data.split("_")[1]))
+        await query.answer("Liked")
+        return
 
-if not rows:
-    await update.message.reply_text("No matches yet")
-    return
+    await query.answer()
 
-msg = "Your matches:\n"
-for u1, u2 in rows:
-    other = u2 if u1 == user_id else u1
-    msg += f"- User {other}\n"
-await update.message.reply_text(msg)
+    if query.data.startswith("feed_"):
+        _, direction, pid = query.data.split("_")
+        page = await news_feed.page(**{f"{direction}_than": int(pid)})
+        if page:
+            text, keyboard = page
+            sender.edit(query.message, text, reply_markup=keyboard)
+
+    elif query.data.startswith("search_"):
+        _, query_id, rank, rowid = query.data.split("_")
+        saved = saved_query(context.user_data, int(query_id))
+        if saved:
+            kind, text = saved
+            page = await searcher.page(
+                kind, text, (float(rank), int(rowid)), int(query_id)
+            )
+            if page:
+                text, keyboard = page
+                sender.edit(query.message, text, reply_markup=keyboard)
 
-async def buttons(update: Update, context: ContextTypes.DEFAULT_TYPE): query = update.callback_query await query.answer() data = query.data user_id = query.from_user.id
+    elif query.data.startswith("dlike_"):
+        liked_id = int(query.data.split("_")[1])
+        new_like, matched = await repo.like_user(user_id, liked_id)
+        if new_like and scorer is not None:
+            scorer.liked(user_id, liked_id)
+        if matched:
+            found = await profiles.get_many((user_id, liked_id))
+            liked = found.get(liked_id) or Profile(liked_id)
+            liker = found.get(user_id) or Profile(user_id)
+            sender.reply(
+                query.message, f"It's a match with {liked.display_name}!"
+            )
+            sender.send(
+                liked_id,
+                f"You have a new match with {liker.display_name}! See /matches",
+                priority=NOTIFICATION
+            )
 
-if data.startswith('like_'):
-    post_id = int(data.split('_')[1])
-    cursor.execute('INSERT INTO likes VALUES (?,?)', (user_id, post_id))
-    conn.commit()
-    await query.edit_message_reply_markup(None)
+    elif query.data.startswith("pass"):
+        if query.data.startswith("pass_"):
+            await repo.pass_user(user_id, int(query.data.split("_")[1]))
+        await send_card(query.message, user_id)
+
+# ---------------- ROUTING ----------------
+COMMANDS = {
+    "start": start, "menu": menu, "profile": profile, "post": post,
+    "feed": feed, "discover": discover, "matches": matches,
+    "search": search, "find": find, "lookup": find,
+}
+# Commands that show the menu until they get handlers of their own.
+MENU_ALIASES = (
+    "help", "settings", "about", "privacy", "terms", "report", "block",
+    "admin", "moderate", "users", "stats", "logout", "delete", "follow",
+    "unfollow", "comments", "like", "share", "upload", "photos", "videos",
+    "notifications", "privacy_settings", "discover_settings", "boost",
+    "premium", "verify", "support", "feedback", "invite", "language", "theme",
+    "logout_all", "reset", "export", "import", "backup", "restore",
+    "analytics", "ads", "monetize", "security", "sessions", "logs", "api",
+    "webapp", "integration", "version", "changelog", "credits", "exit",
+    "quit", "stop", "start_over", "home", "dashboard", "panel", "center",
+    "hub", "root", "index", "main", "core", "system", "app", "bot",
+    "startmenu", "go", "open", "launch", "run", "execute", "begin", "welcome",
+    "enter", "continue", "resume", "next", "previous", "back", "forward",
+    "refresh", "reload", "update", "upgrade", "downgrade", "restart",
+    "shutdown", "poweroff", "sleep", "wake", "ping", "status", "health",
+    "info", "details", "summary", "overview", "report_issue", "bug", "issue",
+    "complaint", "suggest", "idea", "request", "feature", "roadmap", "todo",
+    "plan", "milestone", "goal", "vision", "mission", "values", "policy",
+    "license", "legal", "compliance", "gdpr", "tos", "eula", "copyright",
+    "trademark", "brand", "press", "media", "news", "blog", "events",
+    "community", "forum", "chat", "groups", "channels", "broadcast", "stream",
+    "live", "video_call", "voice_call", "call", "message", "dm", "pm",
+    "notify", "alert", "remind", "schedule", "calendar", "time", "date",
+    "clock", "timezone", "location", "map", "gps", "nearby", "distance",
+    "radius", "filter", "sort", "query", "explore", "browse", "view", "see",
+    "show", "display", "list", "all", "everything", "more", "less", "expand",
+    "collapse", "toggle", "switch", "enable", "disable", "on", "off", "true",
+    "false", "yes", "no", "ok", "cancel", "confirm", "accept", "decline",
+    "agree", "disagree", "approve", "reject", "allow", "deny", "grant",
+    "revoke", "lock", "unlock", "secure", "protect", "encrypt", "decrypt",
+    "hash", "salt", "key", "token", "auth", "login", "signin", "signup",
+    "register", "account", "profile_settings", "preferences", "options",
+    "configuration", "config", "setup", "initialize", "install", "deploy",
+    "build", "compile", "run_app", "serve", "host", "publish", "release",
+    "ship", "push", "pull", "commit", "merge", "branch", "repo", "repository",
+    "git", "github", "version_control", "ci", "cd", "pipeline", "automation",
+    "workflow", "task", "job", "queue", "worker", "thread", "process",
+    "memory", "storage", "database", "sql", "sqlite", "postgres", "mysql",
+    "mongodb", "firebase", "redis", "cache", "performance", "optimize",
+    "scale", "load", "stress", "test", "unit", "integration_test", "qa",
+    "debug", "trace", "log", "monitor", "metrics", "observe", "alerting"
+)
 
-if data.startswith('dlike_'):
-    liked_id = int(data.split('_')[1])
-    cursor.execute('INSERT INTO dating_likes VALUES (?,?)', (user_id, liked_id))
-    cursor.execute('SELECT * FROM dating_likes WHERE liker_id=? AND liked_id=?',
-                   (liked_id, user_id))
-    if cursor.fetchone():
-        cursor.execute('INSERT INTO matches VALUES (?,?)', (user_id, liked_id))
-        conn.commit()
-        await query.message.reply_text("It's a match")
+router = CommandRouter(fallback=menu)
+router.add_all(COMMANDS)
+router.alias(MENU_ALIASES, menu)
+# Time each command under its own name rather than as one "dispatch".
+router.wrap(metrics.timed)
 
----------------- MAIN ----------------
+# ---------------- MAIN ----------------
+metrics_server = MetricsServer(port=config.METRICS_PORT) if config.METRICS_PORT else None
+# Seconds between full reloads of the scoring engine. Only needed when
+# other processes add users; webhook.py sets it for its workers.
+score_reload_interval = None
+score_reloader = None
+
+async def load_scores():
+    scorer.begin_reload()
+    rows, liked_genders = await repo.scoring_rows()
+    loop = asyncio.get_running_loop()
+    fresh = await loop.run_in_executor(None, scorer.build, rows, liked_genders)
+    scorer.finish_reload(fresh)
+
+async def reload_scores(interval):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await load_scores()
+        except Exception:
+            logger.exception("Reloading scores failed")
+
+async def on_start(app):
+    global score_reloader
+    if metrics_server:
+        await metrics_server.start()
+    if scorer is not None:
+        await load_scores()
+        if score_reload_interval:
+            score_reloader = asyncio.create_task(
+                reload_scores(score_reload_interval)
+            )
 
-app = ApplicationBuilder().token("YOUR_BOT_TOKEN").build()
+async def on_stop(app):
+    if score_reloader:
+        score_reloader.cancel()
+    if metrics_server:
+        await metrics_server.close()
+    await sender.close()
+    await writer.close()
+    db.close()
+
+def build_app(request=None):
+    builder = (
+        ApplicationBuilder().token(config.TOKEN)
+        .base_url(config.API_URL)
+        .concurrent_updates(UserOrderedProcessor())
+        .post_init(on_start)
+        .post_stop(on_stop)
+    )
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    app = builder.build()
+    sender.bot = app.bot
+
+    app.add_handler(router.handler())
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
+    app.add_handler(CallbackQueryHandler(buttons))
+
+    for handlers in app.handlers.values():
+        for handler in handlers:
+            if handler.callback != router.dispatch:
+                handler.callback = metrics.timed(handler.callback)
+    metrics.REGISTRY.gauge(
+        "bot_update_queue_depth", "Updates waiting to be processed.",
+        app.update_queue.qsize
+    )
+    metrics.REGISTRY.gauge(
+        "bot_send_queue_depth", "Outgoing messages waiting to be sent.",
+        lambda: sender.depth
+    )
+    metrics.REGISTRY.gauge(
+        "bot_write_queue_depth", "Writes waiting for the next group commit.",
+        lambda: writer.depth
+    )
+    return app
 
-app.add_handler(CommandHandler('start', start)) app.add_handler(CommandHandler('menu', menu)) app.add_handler(CommandHandler('profile', profile)) app.add_handler(CommandHandler('post', post)) app.add_handler(CommandHandler('feed', feed)) app.add_handler(CommandHandler('discover', discover)) app.add_handler(CommandHandler('matches', matches)) app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text)) app.add_handler(MessageHandler(filters.COMMAND, menu)) app.add_handler(MessageHandler(filters.StatusUpdate.ALL, lambda u, c: None)) app.add_handler(CommandHandler('help', menu)) app.add_handler(CommandHandler('settings', menu)) app.add_handler(CommandHandler('about', menu)) app.add_handler(CommandHandler('privacy', menu)) app.add_handler(CommandHandler('terms', menu)) app.add_handler(CommandHandler('report', menu)) app.add_handler(CommandHandler('block', menu)) app.add_handler(CommandHandler('admin', menu)) app.add_handler(CommandHandler('moderate', menu)) app.add_handler(CommandHandler('users', menu)) app.add_handler(CommandHandler('stats', menu)) app.add_handler(CommandHandler('logout', menu)) app.add_handler(CommandHandler('delete', menu)) app.add_handler(CommandHandler('follow', menu)) app.add_handler(CommandHandler('unfollow', menu)) app.add_handler(CommandHandler('comments', menu)) app.add_handler(CommandHandler('like', menu)) app.add_handler(CommandHandler('share', menu)) app.add_handler(CommandHandler('upload', menu)) app.add_handler(CommandHandler('photos', menu)) app.add_handler(CommandHandler('videos', menu)) app.add_handler(CommandHandler('notifications', menu)) app.add_handler(CommandHandler('privacy_settings', menu)) app.add_handler(CommandHandler('discover_settings', menu)) app.add_handler(CommandHandler('boost', menu)) app.add_handler(CommandHandler('premium', menu)) app.add_handler(CommandHandler('verify', menu)) app.add_handler(CommandHandler('support', menu)) app.add_handler(CommandHandler('feedback', menu)) app.add_handler(CommandHandler('invite', menu)) app.add_handler(CommandHandler('language', menu)) app.add_handler(CommandHandler('theme', menu)) app.add_handler(CommandHandler('logout_all', menu)) app.add_handler(CommandHandler('reset', menu)) app.add_handler(CommandHandler('export', menu)) app.add_handler(CommandHandler('import', menu)) app.add_handler(CommandHandler('backup', menu)) app.add_handler(CommandHandler('restore', menu)) app.add_handler(CommandHandler('analytics', menu)) app.add_handler(CommandHandler('ads', menu)) app.add_handler(CommandHandler('monetize', menu)) app.add_handler(CommandHandler('security', menu)) app.add_handler(CommandHandler('sessions', menu)) app.add_handler(CommandHandler('logs', menu)) app.add_handler(CommandHandler('api', menu)) app.add_handler(CommandHandler('webapp', menu)) app.add_handler(CommandHandler('integration', menu)) app.add_handler(CommandHandler('version', menu)) app.add_handler(CommandHandler('changelog', menu)) app.add_handler(CommandHandler('credits', menu)) app.add_handler(CommandHandler('exit', menu)) app.add_handler(CommandHandler('quit', menu)) app.add_handler(CommandHandler('stop', menu)) app.add_handler(CommandHandler('start_over', menu)) app.add_handler(CommandHandler('home', menu)) app.add_handler(CommandHandler('dashboard', menu)) app.add_handler(CommandHandler('panel', menu)) app.add_handler(CommandHandler('center', menu)) app.add_handler(CommandHandler('hub', menu)) app.add_handler(CommandHandler('root', menu)) app.add_handler(CommandHandler('index', menu)) app.add_handler(CommandHandler('main', menu)) app.add_handler(CommandHandler('core', menu)) app.add_handler(CommandHandler('system', menu)) app.add_handler(CommandHandler('app', menu)) app.add_handler(CommandHandler('bot', menu)) app.add_handler(CommandHandler('startmenu', menu)) app.add_handler(CommandHandler('go', menu)) app.add_handler(CommandHandler('open', menu)) app.add_handler(CommandHandler('launch', menu)) app.add_handler(CommandHandler('run', menu)) app.add_handler(CommandHandler('execute', menu)) app.add_handler(CommandHandler('begin', menu)) app.add_handler(CommandHandler('welcome', menu)) app.add_handler(CommandHandler('enter', menu)) app.add_handler(CommandHandler('continue', menu)) app.add_handler(CommandHandler('resume', menu)) app.add_handler(CommandHandler('next', menu)) app.add_handler(CommandHandler('previous', menu)) app.add_handler(CommandHandler('back', menu)) app.add_handler(CommandHandler('forward', menu)) app.add_handler(CommandHandler('refresh', menu)) app.add_handler(CommandHandler('reload', menu)) app.add_handler(CommandHandler('update', menu)) app.add_handler(CommandHandler('upgrade', menu)) app.add_handler(CommandHandler('downgrade', menu)) app.add_handler(CommandHandler('restart', menu)) app.add_handler(CommandHandler('shutdown', menu)) app.add_handler(CommandHandler('poweroff', menu)) app.add_handler(CommandHandler('sleep', menu)) app.add_handler(CommandHandler('wake', menu)) app.add_handler(CommandHandler('ping', menu)) app.add_handler(CommandHandler('status', menu)) app.add_handler(CommandHandler('health', menu)) app.add_handler(CommandHandler('info', menu)) app.add_handler(CommandHandler('details', menu)) app.add_handler(CommandHandler('summary', menu)) app.add_handler(CommandHandler('overview', menu)) app.add_handler(CommandHandler('report_issue', menu)) app.add_handler(CommandHandler('bug', menu)) app.add_handler(CommandHandler('issue', menu)) app.add_handler(CommandHandler('complaint', menu)) app.add_handler(CommandHandler('suggest', menu)) app.add_handler(CommandHandler('idea', menu)) app.add_handler(CommandHandler('request', menu)) app.add_handler(CommandHandler('feature', menu)) app.add_handler(CommandHandler('roadmap', menu)) app.add_handler(CommandHandler('todo', menu)) app.add_handler(CommandHandler('plan', menu)) app.add_handler(CommandHandler('milestone', menu)) app.add_handler(CommandHandler('goal', menu)) app.add_handler(CommandHandler('vision', menu)) app.add_handler(CommandHandler('mission', menu)) app.add_handler(CommandHandler('values', menu)) app.add_handler(CommandHandler('policy', menu)) app.add_handler(CommandHandler('license', menu)) app.add_handler(CommandHandler('legal', menu)) app.add_handler(CommandHandler('compliance', menu)) app.add_handler(CommandHandler('gdpr', menu)) app.add_handler(CommandHandler('tos', menu)) app.add_handler(CommandHandler('eula', menu)) app.add_handler(CommandHandler('copyright', menu)) app.add_handler(CommandHandler('trademark', menu)) app.add_handler(CommandHandler('brand', menu)) app.add_handler(CommandHandler('press', menu)) app.add_handler(CommandHandler('media', menu)) app.add_handler(CommandHandler('news', menu)) app.add_handler(CommandHandler('blog', menu)) app.add_handler(CommandHandler('events', menu)) app.add_handler(CommandHandler('community', menu)) app.add_handler(CommandHandler('forum', menu)) app.add_handler(CommandHandler('chat', menu)) app.add_handler(CommandHandler('groups', menu)) app.add_handler(CommandHandler('channels', menu)) app.add_handler(CommandHandler('broadcast', menu)) app.add_handler(CommandHandler('stream', menu)) app.add_handler(CommandHandler('live', menu)) app.add_handler(CommandHandler('video_call', menu)) app.add_handler(CommandHandler('voice_call', menu)) app.add_handler(CommandHandler('call', menu)) app.add_handler(CommandHandler('message', menu)) app.add_handler(CommandHandler('dm', menu)) app.add_handler(CommandHandler('pm', menu)) app.add_handler(CommandHandler('notify', menu)) app.add_handler(CommandHandler('alert', menu)) app.add_handler(CommandHandler('remind', menu)) app.add_handler(CommandHandler('schedule', menu)) app.add_handler(CommandHandler('calendar', menu)) app.add_handler(CommandHandler('time', menu)) app.add_handler(CommandHandler('date', menu)) app.add_handler(CommandHandler('clock', menu)) app.add_handler(CommandHandler('timezone', menu)) app.add_handler(CommandHandler('location', menu)) app.add_handler(CommandHandler('map', menu)) app.add_handler(CommandHandler('gps', menu)) app.add_handler(CommandHandler('nearby', menu)) app.add_handler(CommandHandler('distance', menu)) app.add_handler(CommandHandler('radius', menu)) app.add_handler(CommandHandler('filter', menu)) app.add_handler(CommandHandler('sort', menu)) app.add_handler(CommandHandler('search', menu)) app.add_handler(CommandHandler('find', menu)) app.add_handler(CommandHandler('lookup', menu)) app.add_handler(CommandHandler('query', menu)) app.add_handler(CommandHandler('explore', menu)) app.add_handler(CommandHandler('browse', menu)) app.add_handler(CommandHandler('view', menu)) app.add_handler(CommandHandler('see', menu)) app.add_handler(CommandHandler('show', menu)) app.add_handler(CommandHandler('display', menu)) app.add_handler(CommandHandler('list', menu)) app.add_handler(CommandHandler('all', menu)) app.add_handler(CommandHandler('everything', menu)) app.add_handler(CommandHandler('more', menu)) app.add_handler(CommandHandler('less', menu)) app.add_handler(CommandHandler('expand', menu)) app.add_handler(CommandHandler('collapse', menu)) app.add_handler(CommandHandler('toggle', menu)) app.add_handler(CommandHandler('switch', menu)) app.add_handler(CommandHandler('enable', menu)) app.add_handler(CommandHandler('disable', menu)) app.add_handler(CommandHandler('on', menu)) app.add_handler(CommandHandler('off', menu)) app.add_handler(CommandHandler('true', menu)) app.add_handler(CommandHandler('false', menu)) app.add_handler(CommandHandler('yes', menu)) app.add_handler(CommandHandler('no', menu)) app.add_handler(CommandHandler('ok', menu)) app.add_handler(CommandHandler('cancel', menu)) app.add_handler(CommandHandler('confirm', menu)) app.add_handler(CommandHandler('accept', menu)) app.add_handler(CommandHandler('decline', menu)) app.add_handler(CommandHandler('agree', menu)) app.add_handler(CommandHandler('disagree', menu)) app.add_handler(CommandHandler('approve', menu)) app.add_handler(CommandHandler('reject', menu)) app.add_handler(CommandHandler('allow', menu)) app.add_handler(CommandHandler('deny', menu)) app.add_handler(CommandHandler('grant', menu)) app.add_handler(CommandHandler('revoke', menu)) app.add_handler(CommandHandler('lock', menu)) app.add_handler(CommandHandler('unlock', menu)) app.add_handler(CommandHandler('secure', menu)) app.add_handler(CommandHandler('protect', menu)) app.add_handler(CommandHandler('encrypt', menu)) app.add_handler(CommandHandler('decrypt', menu)) app.add_handler(CommandHandler('hash', menu)) app.add_handler(CommandHandler('salt', menu)) app.add_handler(CommandHandler('key', menu)) app.add_handler(CommandHandler('token', menu)) app.add_handler(CommandHandler('auth', menu)) app.add_handler(CommandHandler('login', menu)) app.add_handler(CommandHandler('signin', menu)) app.add_handler(CommandHandler('signup', menu)) app.add_handler(CommandHandler('register', menu)) app.add_handler(CommandHandler('account', menu)) app.add_handler(CommandHandler('profile_settings', menu)) app.add_handler(CommandHandler('preferences', menu)) app.add_handler(CommandHandler('options', menu)) app.add_handler(CommandHandler('configuration', menu)) app.add_handler(CommandHandler('config', menu)) app.add_handler(CommandHandler('setup', menu)) app.add_handler(CommandHandler('initialize', menu)) app.add_handler(CommandHandler('install', menu)) app.add_handler(CommandHandler('deploy', menu)) app.add_handler(CommandHandler('build', menu)) app.add_handler(CommandHandler('compile', menu)) app.add_handler(CommandHandler('run_app', menu)) app.add_handler(CommandHandler('serve', menu)) app.add_handler(CommandHandler('host', menu)) app.add_handler(CommandHandler('publish', menu)) app.add_handler(CommandHandler('release', menu)) app.add_handler(CommandHandler('ship', menu)) app.add_handler(CommandHandler('push', menu)) app.add_handler(CommandHandler('pull', menu)) app.add_handler(CommandHandler('commit', menu)) app.add_handler(CommandHandler('merge', menu)) app.add_handler(CommandHandler('branch', menu)) app.add_handler(CommandHandler('repo', menu)) app.add_handler(CommandHandler('repository', menu)) app.add_handler(CommandHandler('git', menu)) app.add_handler(CommandHandler('github', menu)) app.add_handler(CommandHandler('version_control', menu)) app.add_handler(CommandHandler('ci', menu)) app.add_handler(CommandHandler('cd', menu)) app.add_handler(CommandHandler('pipeline', menu)) app.add_handler(CommandHandler('automation', menu)) app.add_handler(CommandHandler('workflow', menu)) app.add_handler(CommandHandler('task', menu)) app.add_handler(CommandHandler('job', menu)) app.add_handler(CommandHandler('queue', menu)) app.add_handler(CommandHandler('worker', menu)) app.add_handler(CommandHandler('thread', menu)) app.add_handler(CommandHandler('process', menu)) app.add_handler(CommandHandler('memory', menu)) app.add_handler(CommandHandler('storage', menu)) app.add_handler(CommandHandler('database', menu)) app.add_handler(CommandHandler('sql', menu)) app.add_handler(CommandHandler('sqlite', menu)) app.add_handler(CommandHandler('postgres', menu)) app.add_handler(CommandHandler('mysql', menu)) app.add_handler(CommandHandler('mongodb', menu)) app.add_handler(CommandHandler('firebase', menu)) app.add_handler(CommandHandler('redis', menu)) app.add_handler(CommandHandler('cache', menu)) app.add_handler(CommandHandler('performance', menu)) app.add_handler(CommandHandler('optimize', menu)) app.add_handler(CommandHandler('scale', menu)) app.add_handler(CommandHandler('load', menu)) app.add_handler(CommandHandler('stress', menu)) app.add_handler(CommandHandler('test', menu)) app.add_handler(CommandHandler('unit', menu)) app.add_handler(CommandHandler('integration_test', menu)) app.add_handler(CommandHandler('qa', menu)) app.add_handler(CommandHandler('debug', menu)) app.add_handler(CommandHandler('trace', menu)) app.add_handler(CommandHandler('log', menu)) app.add_handler(CommandHandler('monitor', menu)) app.add_handler(CommandHandler('metrics', menu)) app.add_handler(CommandHandler('observe', menu)) app.add_handler(CommandHandler('alerting', menu)) app.add_han
+if __name__ == "__main__":
+    # Polling, single process. See webhook.py for the multi-process mode.
+    build_app().run_polling()
@@ -0,0 +1,354 @@
+import asyncio
+import bisect
+import functools
+import logging
+import sqlite3
+import sys
+import threading
+from collections import Counter
+from time import perf_counter
+from urllib.parse import parse_qs, urlsplit
+
+import config
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+           2.5, 5.0, 10.0)
+
+
+# ---------------- METRICS ----------------
+def _escape(value):
+    return (str(value).replace("\\", "\\\\").replace('"', '\\"')
+            .replace("\n", "\\n"))
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                le = _labels(self.labels, labels, f'le="{bound}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {series[-1]}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {cumulative}"
+
+
+class CounterMetric:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.labels, labels)} {value}"
+
+
+class Gauge:
+    """A value read from ``fn()`` at scrape time."""
+
+    def __init__(self, name, help, fn):
+        self.name = name
+        self.help = help
+        self.fn = fn
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        yield f"{self.name} {self.fn()}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _add(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=BUCKETS):
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def counter(self, name, help, labels=()):
+        return self._add(CounterMetric(name, help, labels))
+
+    def gauge(self, name, help, fn):
+        return self._add(Gauge(name, help, fn))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+handler_seconds = REGISTRY.histogram(
+    "bot_handler_seconds", "Handler latency.", ("handler",)
+)
+handler_errors = REGISTRY.counter(
+    "bot_handler_errors_total", "Handlers that raised.", ("handler",)
+)
+query_seconds = REGISTRY.histogram(
+    "bot_sql_seconds", "SQL statement execution time.", ("statement",)
+)
+slow_queries = REGISTRY.counter(
+    "bot_sql_slow_total", "Statements slower than the slow-query threshold.",
+    ("statement",)
+)
+api_seconds = REGISTRY.histogram(
+    "bot_api_seconds", "Bot API call latency.", ("method",)
+)
+api_errors = REGISTRY.counter(
+    "bot_api_errors_total", "Failed Bot API calls.", ("method", "error")
+)
+write_batch_size = REGISTRY.histogram(
+    "bot_write_batch_size", "Operations per group commit.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+)
+commit_seconds = REGISTRY.histogram(
+    "bot_write_batch_seconds", "Time to run and commit one write batch."
+)
+profile_cache = REGISTRY.counter(
+    "bot_profile_cache_total", "Profile lookups by cache result.", ("result",)
+)
+
+
+def threshold_seconds(ms):
+    """Seconds for a slow-query threshold in ms; None (off) when negative."""
+    return ms / 1000 if ms is not None and ms >= 0 else None
+
+
+# Statements slower than this many seconds are logged; None disables it.
+slow_query_threshold = threshold_seconds(config.SLOW_QUERY_MS)
+
+
+# ---------------- INSTRUMENTATION ----------------
+def timed(callback, name=None):
+    """Wrap an async handler so every call feeds bot_handler_seconds."""
+    name = name or callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return await callback(*args, **kwargs)
+        except Exception:
+            handler_errors.inc(name)
+            raise
+        finally:
+            handler_seconds.observe(perf_counter() - start, name)
+
+    return wrapper
+
+
+def _statement_label(sql):
+    return " ".join(sql.split())[:80]
+
+
+def observe_query(sql, params, elapsed):
+    label = _statement_label(sql)
+    query_seconds.observe(elapsed, label)
+    threshold = slow_query_threshold
+    if threshold is not None and elapsed >= threshold:
+        slow_queries.inc(label)
+        logger.warning("Slow query (%.1f ms): %s",
+                       elapsed * 1000, " ".join(sql.split()))
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection that times every execute()."""
+
+    def execute(self, sql, params=()):
+        start = perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            observe_query(sql, params, perf_counter() - start)
+
+    def executemany(self, sql, seq_of_params):
+        start = perf_counter()
+        try:
+            return super().executemany(sql, seq_of_params)
+        finally:
+            observe_query(sql, (), perf_counter() - start)
+
+
+# ---------------- PROFILER ----------------
+class SamplingProfiler:
+    """Samples every thread's stack at a fixed interval.
+
+    stop() returns the samples in folded-stack format ("frame;frame count"
+    per line), which flamegraph tools read directly.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stacks.clear()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._sample, name="profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return ""
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self._stacks.most_common()
+        )
+
+    def _sample(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self._stacks[";".join(reversed(stack))] += 1
+
+
+# ---------------- ENDPOINT ----------------
+MIN_PROFILE_INTERVAL_MS = 1
+
+
+class MetricsServer:
+    """Local HTTP endpoint for metrics and runtime debugging.
+
+    GET /metrics                          Prometheus text format
+    GET /debug/profile/start?interval=ms  start the sampling profiler,
+                                          sampling at least 1 ms apart
+    GET /debug/profile/stop               stop it and return folded stacks
+    GET /debug/slow_query?ms=N            set the slow-query threshold;
+                                          empty or negative turns it off
+    """
+
+    def __init__(self, host="127.0.0.1", port=9100, registry=REGISTRY):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self.profiler = SamplingProfiler()
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info("Metrics on http://%s:%d/metrics", self.host, self.port)
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        self.profiler.stop()
+
+    def respond(self, path, query):
+        global slow_query_threshold
+        if path == "/metrics":
+            return 200, self.registry.render()
+        if path == "/debug/profile/start":
+            ms = float(query.get("interval", ["5"])[0])
+            # Shorter intervals sample in a tight loop holding the GIL.
+            if not MIN_PROFILE_INTERVAL_MS <= ms < float("inf"):
+                raise ValueError(
+                    f"interval must be at least {MIN_PROFILE_INTERVAL_MS} ms"
+                )
+            self.profiler.interval = ms / 1000
+            self.profiler.start()
+            return 200, "profiling\n"
+        if path == "/debug/profile/stop":
+            if not self.profiler.running:
+                return 409, "profiler is not running\n"
+            return 200, self.profiler.stop()
+        if path == "/debug/slow_query":
+            ms = query.get("ms", [""])[0]
+            slow_query_threshold = threshold_seconds(float(ms) if ms else None)
+            if slow_query_threshold is None:
+                return 200, "slow query log: off\n"
+            return 200, f"slow query threshold: {ms} ms\n"
+        return 404, "not found\n"
+
+    async def _handle(self, reader, writer):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            method, target, _ = head.decode("latin-1").split(" ", 2)
+            url = urlsplit(target)
+            if method != "GET":
+                status, body = 405, "method not allowed\n"
+            else:
+                try:
+                    status, body = self.respond(url.path, parse_qs(url.query))
+                except ValueError as e:
+                    status, body = 400, f"{e}\n"
+            data = body.encode()
+            writer.write(
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                f"Content-Type: text/plain; version=0.0.4\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + data
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
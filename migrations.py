@@ -0,0 +1,211 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Each migration is a list of statements applied in one transaction.
+# The database's PRAGMA user_version records how many have been applied,
+# so append new migrations to the end and never edit released ones.
+MIGRATIONS = [
+    # 1: baseline tables, as created by earlier releases.
+    [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            name TEXT,
+            age INTEGER,
+            gender TEXT,
+            location TEXT,
+            bio TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS posts (
+            post_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            content TEXT,
+            timestamp TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS dating_likes (
+            liker_id INTEGER,
+            liked_id INTEGER
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS dating_passes (
+            passer_id INTEGER,
+            passed_id INTEGER
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS matches (
+            user1 INTEGER,
+            user2 INTEGER
+        )
+        """,
+    ],
+    # 2: composite keys (dropping duplicate rows), canonical match pairs
+    # and the reverse-direction indexes.
+    [
+        """
+        CREATE TABLE dating_likes_v2 (
+            liker_id INTEGER NOT NULL,
+            liked_id INTEGER NOT NULL,
+            PRIMARY KEY (liker_id, liked_id)
+        ) WITHOUT ROWID
+        """,
+        """
+        INSERT OR IGNORE INTO dating_likes_v2 (liker_id, liked_id)
+        SELECT liker_id, liked_id FROM dating_likes
+        WHERE liker_id IS NOT NULL AND liked_id IS NOT NULL
+        """,
+        "DROP TABLE dating_likes",
+        "ALTER TABLE dating_likes_v2 RENAME TO dating_likes",
+        "CREATE INDEX dating_likes_liked ON dating_likes (liked_id, liker_id)",
+        """
+        CREATE TABLE dating_passes_v2 (
+            passer_id INTEGER NOT NULL,
+            passed_id INTEGER NOT NULL,
+            PRIMARY KEY (passer_id, passed_id)
+        ) WITHOUT ROWID
+        """,
+        """
+        INSERT OR IGNORE INTO dating_passes_v2 (passer_id, passed_id)
+        SELECT passer_id, passed_id FROM dating_passes
+        WHERE passer_id IS NOT NULL AND passed_id IS NOT NULL
+        """,
+        "DROP TABLE dating_passes",
+        "ALTER TABLE dating_passes_v2 RENAME TO dating_passes",
+        """
+        CREATE TABLE matches_v2 (
+            user_lo INTEGER NOT NULL,
+            user_hi INTEGER NOT NULL,
+            PRIMARY KEY (user_lo, user_hi),
+            CHECK (user_lo < user_hi)
+        ) WITHOUT ROWID
+        """,
+        """
+        INSERT OR IGNORE INTO matches_v2 (user_lo, user_hi)
+        SELECT min(user1, user2), max(user1, user2) FROM matches
+        WHERE user1 IS NOT NULL AND user2 IS NOT NULL AND user1 != user2
+        """,
+        "DROP TABLE matches",
+        "ALTER TABLE matches_v2 RENAME TO matches",
+        "CREATE INDEX matches_hi ON matches (user_hi, user_lo)",
+        "CREATE INDEX posts_user ON posts (user_id, post_id)",
+    ],
+    # 3: post likes, keyed per post. Some early deployments already have
+    # an unkeyed likes table, so it is rebuilt the same way as in 2.
+    [
+        "CREATE TABLE IF NOT EXISTS likes (user_id INTEGER, post_id INTEGER)",
+        """
+        CREATE TABLE likes_v2 (
+            post_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY (post_id, user_id)
+        ) WITHOUT ROWID
+        """,
+        """
+        INSERT OR IGNORE INTO likes_v2 (post_id, user_id)
+        SELECT post_id, user_id FROM likes
+        WHERE post_id IS NOT NULL AND user_id IS NOT NULL
+        """,
+        "DROP TABLE likes",
+        "ALTER TABLE likes_v2 RENAME TO likes",
+    ],
+    # 4: full-text indexes over post content and bios. They are
+    # external-content FTS5 tables kept in sync by triggers, with prefix
+    # indexes so short prefix queries don't scan the whole term list.
+    [
+        """
+        CREATE VIRTUAL TABLE posts_fts USING fts5(
+            content, content='posts', content_rowid='post_id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        """
+        CREATE TRIGGER posts_fts_insert AFTER INSERT ON posts BEGIN
+            INSERT INTO posts_fts (rowid, content)
+            VALUES (new.post_id, new.content);
+        END
+        """,
+        """
+        CREATE TRIGGER posts_fts_delete AFTER DELETE ON posts BEGIN
+            INSERT INTO posts_fts (posts_fts, rowid, content)
+            VALUES ('delete', old.post_id, old.content);
+        END
+        """,
+        """
+        CREATE TRIGGER posts_fts_update AFTER UPDATE OF content ON posts BEGIN
+            INSERT INTO posts_fts (posts_fts, rowid, content)
+            VALUES ('delete', old.post_id, old.content);
+            INSERT INTO posts_fts (rowid, content)
+            VALUES (new.post_id, new.content);
+        END
+        """,
+        "INSERT INTO posts_fts (posts_fts) VALUES ('rebuild')",
+        """
+        CREATE VIRTUAL TABLE users_fts USING fts5(
+            bio, content='users', content_rowid='user_id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        """
+        CREATE TRIGGER users_fts_insert AFTER INSERT ON users BEGIN
+            INSERT INTO users_fts (rowid, bio) VALUES (new.user_id, new.bio);
+        END
+        """,
+        """
+        CREATE TRIGGER users_fts_delete AFTER DELETE ON users BEGIN
+            INSERT INTO users_fts (users_fts, rowid, bio)
+            VALUES ('delete', old.user_id, old.bio);
+        END
+        """,
+        """
+        CREATE TRIGGER users_fts_update AFTER UPDATE OF bio ON users BEGIN
+            INSERT INTO users_fts (users_fts, rowid, bio)
+            VALUES ('delete', old.user_id, old.bio);
+            INSERT INTO users_fts (rowid, bio) VALUES (new.user_id, new.bio);
+        END
+        """,
+        "INSERT INTO users_fts (users_fts) VALUES ('rebuild')",
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, target=SCHEMA_VERSION):
+    """Apply pending migrations up to ``target``; return the final version."""
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        while True:
+            # BEGIN IMMEDIATE takes the write lock before re-reading the
+            # version, so concurrent processes apply each step only once.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = schema_version(conn)
+                if version > SCHEMA_VERSION:
+                    raise RuntimeError(
+                        f"database schema v{version} is newer than "
+                        f"this release (v{SCHEMA_VERSION})"
+                    )
+                if version >= target:
+                    conn.execute("COMMIT")
+                    return version
+                for statement in MIGRATIONS[version]:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version={version + 1}")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            logger.info("Migrated database schema to v%d", version + 1)
+    finally:
+        conn.isolation_level = isolation_level
@@ -0,0 +1,56 @@
+import asyncio
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+UNBOUNDED = 2 ** 31 - 1
+
+
+class UserOrderedProcessor(BaseUpdateProcessor):
+    """Process updates concurrently, but one at a time per user.
+
+    Handlers keep conversation state in ``context.user_data`` (the
+    /profile and /post flows), so two updates from the same user must
+    not interleave. Updates from different users run in parallel up to
+    ``max_concurrent_updates``. asyncio locks are FIFO, so each user's
+    updates still run in arrival order.
+
+    BaseUpdateProcessor takes its semaphore before do_process_update()
+    runs, so with it a user with a long backlog would hold every slot
+    while their updates wait on each other. Its semaphore is therefore
+    left unbounded, and a slot of our own is taken only once the user's
+    lock is held.
+    """
+
+    def __init__(self, max_concurrent_updates=256):
+        super().__init__(UNBOUNDED)
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        self._locks = {}
+
+    async def do_process_update(self, update, coroutine):
+        key = None
+        if isinstance(update, Update) and update.effective_user:
+            key = update.effective_user.id
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        # [lock, number of updates holding or waiting for it]
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0], self._slots:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
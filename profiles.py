@@ -0,0 +1,99 @@
+from collections import OrderedDict
+from time import monotonic
+
+import metrics
+
+
+class Profile:
+    __slots__ = ("user_id", "name", "age", "gender", "location", "bio")
+
+    def __init__(self, user_id, name=None, age=None, gender=None,
+                 location=None, bio=None):
+        self.user_id = user_id
+        self.name = name
+        self.age = age
+        self.gender = gender
+        self.location = location
+        self.bio = bio
+
+    @property
+    def display_name(self):
+        return self.name or f"User {self.user_id}"
+
+
+class ProfileCache:
+    """Bounded LRU of user profiles in front of the users table.
+
+    Unknown users are cached too, as None, so repeated existence checks
+    stay off the database. get_many() loads every miss with one query.
+    Writers call put() or invalidate() after their write commits. A load
+    that overlaps such a write is returned but not cached, so a stale row
+    can't replace a fresh one. When other processes write to the same
+    database, ``max_age`` bounds how stale an entry can get.
+    """
+
+    def __init__(self, repo, capacity=50000, max_age=None):
+        self.repo = repo
+        self.capacity = capacity
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._generation = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return False, None
+        profile, loaded_at = entry
+        if self.max_age is not None and monotonic() - loaded_at > self.max_age:
+            del self._entries[user_id]
+            return False, None
+        self._entries.move_to_end(user_id)
+        return True, profile
+
+    def _store(self, user_id, profile):
+        self._entries[user_id] = (profile, monotonic())
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    async def get(self, user_id):
+        """The profile of ``user_id``, or None if there is no such user."""
+        return (await self.get_many((user_id,))).get(user_id)
+
+    async def get_many(self, user_ids):
+        """Map each existing user in ``user_ids`` to their profile."""
+        user_ids = list(dict.fromkeys(user_ids))
+        found = {}
+        misses = []
+        for user_id in user_ids:
+            hit, profile = self._lookup(user_id)
+            if not hit:
+                misses.append(user_id)
+            elif profile is not None:
+                found[user_id] = profile
+        metrics.profile_cache.inc("hit", amount=len(user_ids) - len(misses))
+        if not misses:
+            return found
+        metrics.profile_cache.inc("miss", amount=len(misses))
+
+        generation = self._generation
+        loaded = {row[0]: Profile(*row) for row in await self.repo.profiles(misses)}
+        found.update(loaded)
+        if generation == self._generation:
+            for user_id in misses:
+                self._store(user_id, loaded.get(user_id))
+        return found
+
+    async def exists(self, user_id):
+        return await self.get(user_id) is not None
+
+    def put(self, profile):
+        self._generation += 1
+        self._store(profile.user_id, profile)
+
+    def invalidate(self, user_id):
+        self._generation += 1
+        self._entries.pop(user_id, None)
@@ -0,0 +1,64 @@
+from telegram.ext import MessageHandler, filters
+
+
+class CommandRouter:
+    """Routes every /command through a single handler.
+
+    python-telegram-bot checks registered handlers one by one, so hundreds
+    of CommandHandlers make every update walk the whole list. This router
+    is registered once, parses the command once, and finds its callback
+    with a dict lookup. Unknown commands go to ``fallback``.
+    """
+
+    def __init__(self, fallback=None):
+        self.routes = {}
+        self.fallback = fallback
+
+    def add(self, name, callback):
+        self.routes[name.lower()] = callback
+
+    def add_all(self, commands):
+        for name, callback in commands.items():
+            self.add(name, callback)
+
+    def alias(self, names, callback):
+        for name in names:
+            self.add(name, callback)
+
+    def wrap(self, decorator):
+        """Apply ``decorator`` once to each distinct callback."""
+        wrapped = {}
+        for name, callback in self.routes.items():
+            if callback not in wrapped:
+                wrapped[callback] = decorator(callback)
+            self.routes[name] = wrapped[callback]
+        if self.fallback is not None:
+            self.fallback = wrapped.get(self.fallback) or decorator(self.fallback)
+
+    def resolve(self, text, bot_username=None):
+        """Return ``(callback, args)`` for a command message, or None."""
+        parts = text.split()
+        if not parts or not parts[0].startswith("/"):
+            return None
+        command, _, target = parts[0][1:].partition("@")
+        if target and bot_username and target.lower() != bot_username.lower():
+            return None
+        callback = self.routes.get(command.lower(), self.fallback)
+        if callback is None:
+            return None
+        return callback, parts[1:]
+
+    async def dispatch(self, update, context):
+        message = update.effective_message
+        route = self.resolve(message.text or "", context.bot.username)
+        if route is None:
+            return
+        callback, context.args = route
+        return await callback(update, context)
+
+    def handler(self):
+        # Match what CommandHandler did: messages and edited messages,
+        # never channel posts, which have no effective_user.
+        return MessageHandler(
+            filters.COMMAND & filters.UpdateType.MESSAGES, self.dispatch
+        )
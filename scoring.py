@@ -0,0 +1,265 @@
+"""Vectorized compatibility scoring for the discover deck.
+
+Every known user is a row in a set of NumPy arrays: age, gender code,
+location bucket and a hashed bag-of-words vector of their bio. Scoring
+all candidates for one user is a handful of array operations and one
+matrix-vector product, and the best ``k`` come out of argpartition
+without sorting everyone.
+
+There is no preference column, so a user's gender preference is learned
+from the genders of the people they liked, smoothed towards indifference.
+"""
+import re
+import zlib
+
+import numpy as np
+
+UNKNOWN, MALE, FEMALE, OTHER = range(4)
+GENDERS = {
+    "m": MALE, "male": MALE, "man": MALE,
+    "f": FEMALE, "female": FEMALE, "woman": FEMALE,
+}
+
+DEFAULT_WEIGHTS = {
+    "age": 1.0,
+    "gender": 1.0,
+    "location": 0.5,
+    "bio": 1.5,
+    # Keeps decks from being identical for users with the same profile.
+    "noise": 0.05,
+}
+
+_ARRAYS = ("ids", "listed", "age", "gender", "location", "bio",
+           "liked_genders")
+_TOKEN = re.compile(r"\w{3,}")
+
+
+def gender_code(gender):
+    if not gender or not gender.strip():
+        return UNKNOWN
+    return GENDERS.get(gender.strip().lower(), OTHER)
+
+
+def location_bucket(location):
+    """A stable non-zero bucket for a location; 0 when unknown."""
+    if not location or not location.strip():
+        return 0
+    return zlib.crc32(location.strip().lower().encode()) | 1
+
+
+def bio_vector(bio, dim):
+    """Signed hashed bag of words, L2-normalized."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in _TOKEN.findall((bio or "").lower()):
+        h = zlib.crc32(token.encode())
+        vector[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector
+
+
+def _age(age):
+    try:
+        return float(age)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class _State:
+    """The rows and arrays of an engine.
+
+    It is never resized in place: growing or reloading builds a new one,
+    and the engine switches to it with a single assignment.
+    """
+
+    __slots__ = ("rows", "n") + _ARRAYS
+
+    def __init__(self, capacity, dim):
+        self.rows = {}
+        self.n = 0
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        # Users who never filled in a profile are kept but never suggested.
+        self.listed = np.zeros(capacity, dtype=bool)
+        self.age = np.full(capacity, np.nan, dtype=np.float32)
+        self.gender = np.zeros(capacity, dtype=np.int8)
+        self.location = np.zeros(capacity, dtype=np.uint32)
+        self.bio = np.zeros((capacity, dim), dtype=np.float32)
+        # How many people of each gender code every user has liked.
+        self.liked_genders = np.zeros((capacity, 4), dtype=np.float32)
+
+    def grown(self):
+        """A copy with twice the capacity, sharing the row index."""
+        state = _State.__new__(_State)
+        state.rows, state.n = self.rows, self.n
+        capacity = 2 * len(self.ids)
+        for name in _ARRAYS:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            if name == "age":
+                new.fill(np.nan)
+            new[:len(old)] = old
+            setattr(state, name, new)
+        return state
+
+
+class ScoringEngine:
+    """Candidate attributes kept as arrays, one row per user.
+
+    upsert() writes a row in place, doubling the arrays when they fill
+    up, and liked() updates the liker's learned preference. top_k() takes
+    one snapshot of the state when it starts and reads only that, so it
+    can run on another thread while the event loop keeps writing. Rows
+    added after the snapshot are ignored; a row rewritten during the call
+    may be scored with a mix of old and new values.
+
+    To reload from the database without blocking the loop, call
+    begin_reload(), read the rows, build() a fresh engine on a thread and
+    pass it to finish_reload(). Changes made in between are replayed on
+    top of it. A like that commits while the rows are being read can be
+    counted twice until the next reload.
+    """
+
+    def __init__(self, weights=None, dim=64, age_scale=5.0, capacity=1024,
+                 seed=None):
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.dim = dim
+        self.age_scale = age_scale
+        self.seed = seed
+        self._rng = np.random.default_rng(seed)
+        self._journal = None
+        self._state = _State(capacity, dim)
+
+    def __len__(self):
+        return self._state.n
+
+    def _row(self, user_id):
+        state = self._state
+        row = state.rows.get(user_id)
+        if row is None:
+            if state.n == len(state.ids):
+                state = self._state = state.grown()
+            row = state.n
+            state.ids[row] = user_id
+            state.rows[user_id] = row
+            state.n += 1
+        return row
+
+    # ---------------- UPDATES ----------------
+    def upsert(self, user_id, age=None, gender=None, location=None, bio=None,
+               listed=True):
+        if self._journal is not None:
+            self._journal.append(
+                ("upsert", (user_id, age, gender, location, bio, listed))
+            )
+        row = self._row(user_id)
+        state = self._state
+        state.listed[row] = listed
+        state.age[row] = _age(age)
+        state.gender[row] = gender_code(gender)
+        state.location[row] = location_bucket(location)
+        state.bio[row] = bio_vector(bio, self.dim)
+
+    def liked(self, liker_id, liked_id):
+        """Count a new like; call it once per like, not per tap."""
+        if self._journal is not None:
+            self._journal.append(("liked", (liker_id, liked_id)))
+        state = self._state
+        liker = state.rows.get(liker_id)
+        liked = state.rows.get(liked_id)
+        if liker is not None and liked is not None:
+            state.liked_genders[liker, state.gender[liked]] += 1
+
+    def load(self, profiles, liked_genders=()):
+        """Replace all rows.
+
+        ``profiles`` yields ``(user_id, age, gender, location, bio)``,
+        optionally followed by ``listed``, and ``liked_genders`` yields
+        ``(liker_id, gender, count)``.
+        """
+        profiles = list(profiles)
+        self._state = _State(
+            max(1024, 1 << len(profiles).bit_length()), self.dim
+        )
+        for row in profiles:
+            self.upsert(*row)
+        state = self._state
+        for liker_id, gender, count in liked_genders:
+            liker = state.rows.get(liker_id)
+            if liker is not None:
+                state.liked_genders[liker, gender_code(gender)] += count
+
+    def build(self, profiles, liked_genders=()):
+        """A new engine with the same settings, loaded from the given rows."""
+        engine = ScoringEngine(
+            self.weights, self.dim, self.age_scale, seed=self.seed
+        )
+        engine.load(profiles, liked_genders)
+        return engine
+
+    def begin_reload(self):
+        self._journal = []
+
+    def finish_reload(self, fresh):
+        journal, self._journal = self._journal or [], None
+        self._state = fresh._state
+        for method, args in journal:
+            getattr(self, method)(*args)
+
+    # ---------------- SCORING ----------------
+    def scores(self, user_id):
+        """``(ids, scores)`` of every row for ``user_id``.
+
+        The user's own row and unlisted users score -inf.
+        """
+        return self._scores(self._state, user_id)
+
+    def _scores(self, state, user_id):
+        n = state.n
+        ids, listed = state.ids[:n], state.listed[:n]
+        age, gender = state.age[:n], state.gender[:n]
+        location, bio = state.location[:n], state.bio[:n]
+        w = self.weights
+        row = state.rows.get(user_id)
+        if row is not None and row >= n:
+            row = None
+
+        scores = np.zeros(n, dtype=np.float32)
+        if w["noise"]:
+            scores += w["noise"] * self._rng.random(n, dtype=np.float32)
+        scores[~listed] = -np.inf
+        if row is None:
+            return ids, scores
+
+        if w["age"] and not np.isnan(age[row]):
+            closeness = np.exp(-np.abs(age - age[row]) / self.age_scale)
+            scores += w["age"] * np.nan_to_num(closeness, nan=0.0)
+        if w["gender"]:
+            counts = state.liked_genders[row]
+            preference = (counts + 1.0) / (counts.sum() + len(counts))
+            scores += w["gender"] * preference[gender]
+        if w["location"] and location[row]:
+            scores += w["location"] * (location == location[row])
+        if w["bio"]:
+            scores += w["bio"] * (bio @ bio[row])
+        scores[row] = -np.inf
+        return ids, scores
+
+    def top_k(self, user_id, k, exclude=()):
+        """The ``k`` best candidates for ``user_id``, best first.
+
+        Ids in ``exclude`` are never returned.
+        """
+        state = self._state
+        ids, scores = self._scores(state, user_id)
+        rows = [state.rows.get(i) for i in exclude]
+        rows = [r for r in rows if r is not None and r < len(scores)]
+        if rows:
+            scores[rows] = -np.inf
+
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return ids[best].tolist()
@@ -0,0 +1,141 @@
+import re
+from collections import OrderedDict
+from time import monotonic
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from profiles import Profile
+
+POSTS = "posts"
+PEOPLE = "people"
+MAX_TERMS = 8
+MAX_BIO_CHARS = 200
+# Searches each user can still page through with More.
+SAVED_QUERIES = 10
+
+_TERM = re.compile(r"\w+")
+
+
+def fts_query(text):
+    """Turn user input into an FTS5 query, or None if it has no terms.
+
+    Every term must match. Terms of two or more characters also match as
+    prefixes. Terms are quoted, so FTS5 operators in the input are
+    matched as words rather than parsed.
+    """
+    terms = _TERM.findall(text.lower())[:MAX_TERMS]
+    if not terms:
+        return None
+    return " ".join(f'"{t}"*' if len(t) > 1 else f'"{t}"' for t in terms)
+
+
+def save_query(user_data, kind, text):
+    """Remember a search in ``user_data`` and return its short id."""
+    saved = user_data.setdefault("searches", OrderedDict())
+    query_id = user_data.get("search_seq", 0) + 1
+    user_data["search_seq"] = query_id
+    saved[query_id] = (kind, text)
+    while len(saved) > SAVED_QUERIES:
+        saved.popitem(last=False)
+    return query_id
+
+
+def saved_query(user_data, query_id):
+    """``(kind, text)`` of a saved search, or None once it has expired."""
+    return user_data.get("searches", {}).get(query_id)
+
+
+class Search:
+    """BM25-ranked full-text search over posts and bios.
+
+    Results are paged by a ``(rank, rowid)`` keyset carried in the More
+    button, so no page ever uses OFFSET. The query text is too long for
+    callback data, so the button carries the short id from save_query()
+    instead and older result messages keep paging their own search.
+    Result pages are kept in a small LRU. Writes clear the matching kind
+    with invalidate(), and ``max_age`` bounds how long a page can miss
+    writes made by other processes. Ranks move slightly as the corpus grows, so
+    a page fetched later can repeat or skip a result near its edge.
+    """
+
+    def __init__(self, repo, profiles, page_size=5, cache_size=256,
+                 max_age=None):
+        self.repo = repo
+        self.profiles = profiles
+        self.page_size = page_size
+        self.cache_size = cache_size
+        self.max_age = max_age
+        self._cache = OrderedDict()
+        self._generations = {POSTS: 0, PEOPLE: 0}
+
+    def invalidate(self, kind):
+        self._generations[kind] += 1
+        for key in [k for k in self._cache if k[0] == kind]:
+            del self._cache[key]
+
+    async def page(self, kind, text, after=None, query_id=0):
+        """Return ``(text, reply_markup)`` for a page of results, or None."""
+        match = fts_query(text)
+        if match is None:
+            return None
+        rows = await self._rows(kind, match, after)
+        if not rows:
+            return None
+        more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if kind == POSTS:
+            parts, buttons = await self._render_posts(rows)
+        else:
+            parts, buttons = await self._render_people(rows)
+
+        keyboard = [buttons] if buttons else []
+        if more:
+            rowid, rank = rows[-1][:2]
+            keyboard.append([InlineKeyboardButton(
+                "More", callback_data=f"search_{query_id}_{rank!r}_{rowid}"
+            )])
+        header = f"Results for: {' '.join(_TERM.findall(text)[:MAX_TERMS])}"
+        return "\n\n".join([header] + parts), InlineKeyboardMarkup(keyboard)
+
+    async def _rows(self, kind, match, after):
+        key = (kind, match, after)
+        entry = self._cache.get(key)
+        if entry is not None:
+            rows, cached_at = entry
+            if self.max_age is None or monotonic() - cached_at <= self.max_age:
+                self._cache.move_to_end(key)
+                return rows
+            del self._cache[key]
+
+        generation = self._generations[kind]
+        fetch = self.repo.search_posts if kind == POSTS else self.repo.search_people
+        rows = await fetch(match, after, self.page_size + 1)
+        if generation == self._generations[kind]:
+            self._cache[key] = (rows, monotonic())
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return rows
+
+    async def _render_posts(self, rows):
+        authors = await self.profiles.get_many([uid for _, _, uid, _ in rows])
+        parts = []
+        likes = []
+        for n, (pid, _, uid, snippet) in enumerate(rows, 1):
+            name = (authors.get(uid) or Profile(uid)).display_name
+            parts.append(f"{n}. {name}:\n{snippet}")
+            likes.append(InlineKeyboardButton(f"Like {n}", callback_data=f"like_{pid}"))
+        return parts, likes
+
+    async def _render_people(self, rows):
+        found = await self.profiles.get_many([uid for uid, _ in rows])
+        parts = []
+        for n, (uid, _) in enumerate(rows, 1):
+            person = found.get(uid) or Profile(uid)
+            line = f"{n}. {person.display_name}"
+            if person.age is not None:
+                line += f", {person.age}"
+            bio = person.bio or ""
+            if len(bio) > MAX_BIO_CHARS:
+                bio = bio[:MAX_BIO_CHARS - 1] + "…"
+            parts.append(f"{line}\n{bio}" if bio else line)
+        return parts, []
@@ -0,0 +1,312 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import timedelta
+from time import monotonic, perf_counter
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+NOTIFICATION = 10
+
+MAX_MESSAGE_CHARS = 4096
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "stamp", "blocked_until")
+
+    def __init__(self, rate, capacity, now=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = monotonic() if now is None else now
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        if now > self.stamp:
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+
+    def delay(self, now):
+        """Seconds until a token can be taken."""
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, until):
+        self.blocked_until = max(self.blocked_until, until)
+
+    def idle(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+
+class _Outgoing:
+    __slots__ = ("priority", "seq", "method", "chat_id", "text", "kwargs",
+                 "future", "done", "attempts")
+
+    def __init__(self, priority, seq, method, chat_id, text, kwargs, future):
+        self.priority = priority
+        self.seq = seq
+        self.method = method
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs
+        self.future = future
+        self.done = False
+        self.attempts = 0
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    @property
+    def mergeable(self):
+        return self.method == "send_message" and not self.kwargs
+
+
+class SendScheduler:
+    """Central, rate-limited queue for outbound Telegram messages.
+
+    Handlers enqueue with send()/reply()/edit() and return immediately.
+    A dispatcher task picks the most urgent message (lowest priority
+    value, then FIFO) whose chat has a token, spending one token from the
+    global bucket as well, and keeps at most one request in flight per
+    chat so chats see messages in order. Consecutive plain-text messages
+    queued for the same chat are sent as one. RetryAfter blocks the chat
+    for the time Telegram asked for, and transient network errors back
+    off, in both cases re-queueing the message.
+    """
+
+    def __init__(self, bot=None, global_rate=30, chat_rate=1, chat_burst=3,
+                 max_attempts=5):
+        self.bot = bot
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_attempts = max_attempts
+        self._global = TokenBucket(global_rate, global_rate)
+        self._buckets = {}
+        self._by_chat = {}
+        self._heap = []
+        self._busy = set()
+        self._inflight = set()
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._pending = 0
+
+    @property
+    def depth(self):
+        """Messages queued and not yet handed to the Bot API."""
+        return self._pending
+
+    # ---------------- ENQUEUE ----------------
+    def send(self, chat_id, text, priority=INTERACTIVE, **kwargs):
+        return self._enqueue("send_message", chat_id, text, priority, kwargs)
+
+    def reply(self, message, text, priority=INTERACTIVE, **kwargs):
+        return self.send(message.chat_id, text, priority, **kwargs)
+
+    def edit(self, message, text, priority=INTERACTIVE, **kwargs):
+        kwargs["message_id"] = message.message_id
+        return self._enqueue(
+            "edit_message_text", message.chat_id, text, priority, kwargs
+        )
+
+    def _enqueue(self, method, chat_id, text, priority, kwargs):
+        loop = asyncio.get_running_loop()
+        if self._task is None:
+            self._task = loop.create_task(self._run())
+        future = loop.create_future()
+        # Failures are logged here; callers that don't await aren't warned.
+        future.add_done_callback(_retrieve)
+        msg = _Outgoing(
+            priority, next(self._seq), method, chat_id, text, kwargs, future
+        )
+        self._by_chat.setdefault(chat_id, []).append(msg)
+        heapq.heappush(self._heap, msg)
+        self._pending += 1
+        self._wakeup.set()
+        return future
+
+    # ---------------- DISPATCH ----------------
+    def _bucket(self, chat_id):
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(
+                self.chat_rate, self.chat_burst
+            )
+        return bucket
+
+    def _pop_ready(self, now):
+        """Pop the most urgent sendable message, or return the time to wait."""
+        deferred = []
+        wait = None
+        found = None
+        while self._heap:
+            msg = heapq.heappop(self._heap)
+            if msg.done:
+                continue
+            if msg.chat_id in self._busy:
+                deferred.append(msg)
+                continue
+            delay = self._bucket(msg.chat_id).delay(now)
+            if delay <= 0:
+                found = msg
+                break
+            deferred.append(msg)
+            wait = delay if wait is None else min(wait, delay)
+        for msg in deferred:
+            heapq.heappush(self._heap, msg)
+        return found, wait
+
+    def _coalesce(self, msg):
+        pending = self._by_chat[msg.chat_id]
+        batch = [msg]
+        if msg.mergeable:
+            size = len(msg.text)
+            start = pending.index(msg) + 1
+            for other in pending[start:]:
+                if (not other.mergeable or other.priority != msg.priority
+                        or size + 2 + len(other.text) > MAX_MESSAGE_CHARS):
+                    break
+                size += 2 + len(other.text)
+                batch.append(other)
+        for item in batch:
+            item.done = True
+            pending.remove(item)
+        if not pending:
+            del self._by_chat[msg.chat_id]
+        self._pending -= len(batch)
+        return batch
+
+    async def _wait(self, timeout=None):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        while True:
+            if not self._heap:
+                await self._wait()
+                continue
+            now = monotonic()
+            delay = self._global.delay(now)
+            if delay > 0:
+                await self._wait(delay)
+                continue
+            msg, wait = self._pop_ready(now)
+            if msg is None:
+                await self._wait(wait)
+                continue
+
+            self._global.take(now)
+            self._bucket(msg.chat_id).take(now)
+            self._busy.add(msg.chat_id)
+            task = asyncio.create_task(self._deliver(self._coalesce(msg)))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+            if len(self._buckets) > 10000:
+                self._prune(now)
+
+    async def _deliver(self, batch):
+        msg = batch[0]
+        text = "\n\n".join(item.text for item in batch)
+        start = perf_counter()
+        try:
+            method = getattr(self.bot, msg.method)
+            try:
+                result = await method(chat_id=msg.chat_id, text=text, **msg.kwargs)
+            except Exception as e:
+                metrics.api_errors.inc(msg.method, type(e).__name__)
+                raise
+            finally:
+                metrics.api_seconds.observe(perf_counter() - start, msg.method)
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            if isinstance(retry_after, timedelta):
+                retry_after = retry_after.total_seconds()
+            logger.warning("Flood limit in chat %s, retrying in %ss",
+                           msg.chat_id, retry_after)
+            self._bucket(msg.chat_id).block(monotonic() + retry_after)
+            self._requeue(batch)
+        except (BadRequest, Forbidden) as e:
+            if msg.method == "edit_message_text" and "not modified" in str(e):
+                self._resolve(batch, result=None)
+            else:
+                logger.warning("Dropping message to chat %s: %s", msg.chat_id, e)
+                self._resolve(batch, error=e)
+        except NetworkError as e:
+            msg.attempts += 1
+            if msg.attempts >= self.max_attempts:
+                logger.error("Giving up on message to chat %s: %s", msg.chat_id, e)
+                self._resolve(batch, error=e)
+            else:
+                backoff = 0.5 * 2 ** msg.attempts
+                self._bucket(msg.chat_id).block(monotonic() + backoff)
+                self._requeue(batch)
+        except Exception as e:
+            logger.exception("Failed to send message to chat %s", msg.chat_id)
+            self._resolve(batch, error=e)
+        else:
+            self._resolve(batch, result=result)
+        finally:
+            self._busy.discard(msg.chat_id)
+            self._wakeup.set()
+
+    def _requeue(self, batch):
+        pending = self._by_chat.setdefault(batch[0].chat_id, [])
+        for item in batch:
+            item.done = False
+            heapq.heappush(self._heap, item)
+        pending[:0] = batch
+        pending.sort(key=lambda item: item.seq)
+        self._pending += len(batch)
+
+    def _resolve(self, batch, result=None, error=None):
+        for item in batch:
+            if item.future.done():
+                continue
+            if error is None:
+                item.future.set_result(result)
+            else:
+                item.future.set_exception(error)
+
+    def _prune(self, now):
+        for chat_id in [c for c, b in self._buckets.items()
+                        if c not in self._by_chat and c not in self._busy
+                        and b.idle(now)]:
+            del self._buckets[chat_id]
+
+    async def close(self, timeout=10.0):
+        """Give queued messages up to ``timeout`` seconds to go out, then stop."""
+        if self._task is None:
+            return
+        deadline = monotonic() + timeout
+        while (self._pending or self._inflight) and monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        self._task.cancel()
+        for task in list(self._inflight):
+            task.cancel()
+        await asyncio.gather(self._task, *self._inflight, return_exceptions=True)
+        self._task = None
+        if self._pending:
+            logger.warning("Dropped %d unsent messages on shutdown", self._pending)
+
+
+def _retrieve(future):
+    if not future.cancelled():
+        future.exception()
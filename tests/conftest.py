@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import Database  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path):
+    """A migrated database in a temporary file."""
+    db = Database(str(tmp_path / "bot.db"))
+    db.migrate()
+    yield db
+    db.close()
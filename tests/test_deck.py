@@ -0,0 +1,103 @@
+import asyncio
+import random
+
+import pytest
+
+import config
+from db import Repository
+from deck import DiscoverDeck
+from profiles import Profile, ProfileCache
+from scoring import ScoringEngine
+from writer import WriteBehind
+
+
+class ListDeck:
+    def __init__(self, ids):
+        self.ids = list(ids)
+
+    async def next(self, user_id):
+        return self.ids.pop(0) if self.ids else None
+
+
+class Replies:
+    def __init__(self):
+        self.texts = []
+
+    def reply(self, message, text, **kwargs):
+        self.texts.append(text)
+
+
+def test_send_card_skips_candidates_without_a_profile(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "bot.db"))
+    import main
+
+    class Profiles:
+        async def get(self, user_id):
+            return Profile(7, "Ann", 30) if user_id == 7 else None
+
+    replies = Replies()
+    monkeypatch.setattr(main, "profiles", Profiles())
+    monkeypatch.setattr(main, "sender", replies)
+
+    monkeypatch.setattr(main, "deck", ListDeck([5, 6, 7, 8]))
+    asyncio.run(main.send_card(None, 1))
+    # Only unknown candidates, and the deck starts over with them.
+    monkeypatch.setattr(main, "deck", ListDeck([5, 6, 5, 6]))
+    asyncio.run(main.send_card(None, 1))
+    assert replies.texts == ["Ann, 30", "No users found"]
+
+
+# ---------------- DECK ----------------
+async def swipe_all(deck, repo, user_id):
+    shown = []
+    while True:
+        candidate = await deck.next(user_id)
+        if candidate is None:
+            return shown
+        shown.append(candidate)
+        if len(shown) % 2:
+            await repo.like_user(user_id, candidate)
+        else:
+            await repo.pass_user(user_id, candidate)
+
+
+@pytest.mark.parametrize("scored", [False, True])
+@pytest.mark.parametrize("seed", range(3))
+def test_swiping_through_the_deck(database, scored, seed):
+    random.seed(seed)
+
+    async def go():
+        writer = WriteBehind(database)
+        repo = Repository(database, writer)
+        try:
+            for user_id in range(1, 41):
+                await repo.create_user(user_id)
+                if user_id % 10:
+                    await repo.update_profile(
+                        user_id, f"u{user_id}", 30, "f", "Oslo", ""
+                    )
+            # Swiped before the deck was built; never shown.
+            await repo.like_user(1, 2)
+            await repo.pass_user(1, 3)
+
+            scorer = None
+            if scored:
+                scorer = ScoringEngine(seed=seed)
+                scorer.load(*await repo.scoring_rows())
+            deck = DiscoverDeck(repo, ProfileCache(repo), scorer,
+                                batch_size=5, low_water=2)
+            shown = await swipe_all(deck, repo, 1)
+            assert len(shown) == len(set(shown))
+            assert set(shown) == {u for u in range(4, 41) if u % 10}
+            assert await deck.next(1) is None
+
+            # Once exhausted, a new pass picks up users who joined since.
+            await repo.create_user(50)
+            await repo.update_profile(50, "late", 30, "f", "Oslo", "")
+            if scorer is not None:
+                scorer.upsert(50, 30, "f", "Oslo", "")
+            assert await deck.next(1) == 50
+        finally:
+            await writer.close()
+
+    asyncio.run(go())
@@ -0,0 +1,39 @@
+import asyncio
+
+import metrics
+
+
+def get(server, target):
+    async def go():
+        await server.start()
+        port = server._server.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET {target} HTTP/1.1\r\n\r\n".encode())
+            response = await reader.read()
+            writer.close()
+        finally:
+            await server.close()
+        return response
+
+    status = asyncio.run(go()).split(b" ", 2)[1]
+    return int(status)
+
+
+def test_profile_interval_is_validated():
+    server = metrics.MetricsServer(port=0)
+    for interval in ("0", "-5", "0.5", "nan", "inf", "abc"):
+        assert get(server, f"/debug/profile/start?interval={interval}") == 400
+        assert not server.profiler.running
+    assert get(server, "/debug/profile/start?interval=2") == 200
+    assert server.profiler.interval == 0.002
+
+
+def test_slow_query_threshold(monkeypatch):
+    monkeypatch.setattr(metrics, "slow_query_threshold", None)
+    server = metrics.MetricsServer()
+    assert server.respond("/debug/slow_query", {"ms": ["250"]})[0] == 200
+    assert metrics.slow_query_threshold == 0.25
+    assert server.respond("/debug/slow_query", {"ms": ["-1"]}) == (
+        200, "slow query log: off\n")
+    assert metrics.slow_query_threshold is None
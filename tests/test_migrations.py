@@ -0,0 +1,52 @@
+import sqlite3
+
+import pytest
+
+import migrations
+
+
+def baseline_db(path):
+    """A database shaped like the pre-migration releases, with duplicates."""
+    conn = sqlite3.connect(path)
+    for statement in migrations.MIGRATIONS[0]:
+        conn.execute(statement)
+    conn.execute("CREATE TABLE likes (user_id INTEGER, post_id INTEGER)")
+    conn.executemany("INSERT INTO users (user_id, name) VALUES (?,?)",
+                     [(1, "a"), (2, "b"), (3, "c")])
+    conn.executemany("INSERT INTO dating_likes VALUES (?,?)",
+                     [(1, 2), (1, 2), (2, 1), (None, 3)])
+    conn.executemany("INSERT INTO dating_passes VALUES (?,?)",
+                     [(3, 1), (3, 1)])
+    conn.executemany("INSERT INTO matches VALUES (?,?)",
+                     [(1, 2), (2, 1), (3, 3)])
+    conn.executemany("INSERT INTO likes VALUES (?,?)",
+                     [(1, 10), (1, 10), (2, 10)])
+    conn.commit()
+    return conn
+
+
+def test_migrate_deduplicates_baseline(tmp_path):
+    conn = baseline_db(tmp_path / "bot.db")
+    assert migrations.migrate(conn) == migrations.SCHEMA_VERSION
+    assert migrations.schema_version(conn) == migrations.SCHEMA_VERSION
+
+    rows = lambda sql: sorted(conn.execute(sql).fetchall())
+    assert rows("SELECT liker_id, liked_id FROM dating_likes") == [(1, 2), (2, 1)]
+    assert rows("SELECT passer_id, passed_id FROM dating_passes") == [(3, 1)]
+    assert rows("SELECT user_lo, user_hi FROM matches") == [(1, 2)]
+    assert rows("SELECT post_id, user_id FROM likes") == [(10, 1), (10, 2)]
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO dating_likes VALUES (1, 2)")
+
+
+def test_migrate_is_idempotent(tmp_path):
+    conn = baseline_db(tmp_path / "bot.db")
+    migrations.migrate(conn)
+    assert migrations.migrate(conn) == migrations.SCHEMA_VERSION
+
+
+def test_migrate_refuses_newer_schema(tmp_path):
+    conn = sqlite3.connect(tmp_path / "bot.db")
+    conn.execute(f"PRAGMA user_version={migrations.SCHEMA_VERSION + 1}")
+    with pytest.raises(RuntimeError):
+        migrations.migrate(conn)
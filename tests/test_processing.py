@@ -0,0 +1,37 @@
+import asyncio
+from datetime import datetime
+
+from telegram import Chat, Message, Update, User
+
+from processing import UserOrderedProcessor
+
+
+def update(user_id, update_id):
+    user = User(user_id, "u", False)
+    message = Message(update_id, datetime.now(), Chat(user_id, "private"),
+                      from_user=user, text="hi")
+    return Update(update_id, message=message)
+
+
+def test_one_users_backlog_does_not_block_others():
+    async def run():
+        processor = UserOrderedProcessor(max_concurrent_updates=4)
+        done = []
+
+        async def work(user_id, n):
+            await asyncio.sleep(0.01)
+            done.append((user_id, n))
+
+        tasks = [
+            asyncio.create_task(processor.process_update(update(1, n), work(1, n)))
+            for n in range(50)
+        ]
+        other = asyncio.create_task(
+            processor.process_update(update(2, 99), work(2, 99))
+        )
+        await asyncio.wait_for(other, 0.2)
+        await asyncio.gather(*tasks)
+        assert [n for user, n in done if user == 1] == list(range(50))
+        assert not processor._locks
+
+    asyncio.run(run())
@@ -0,0 +1,88 @@
+import asyncio
+
+from profiles import Profile, ProfileCache
+
+
+class FakeRepo:
+    def __init__(self, rows):
+        self.rows = dict(rows)
+        self.calls = []
+        self.gate = None
+
+    async def profiles(self, user_ids):
+        self.calls.append(list(user_ids))
+        rows = [self.rows[u] for u in user_ids if u in self.rows]
+        if self.gate is not None:
+            await self.gate.wait()
+        return rows
+
+
+def row(user_id, name):
+    return (user_id, name, 30, "f", "Oslo", "")
+
+
+def test_misses_load_in_one_query_and_unknown_users_are_cached():
+    repo = FakeRepo({u: row(u, f"u{u}") for u in (1, 2)})
+    cache = ProfileCache(repo)
+
+    async def go():
+        found = await cache.get_many([1, 2, 99, 1])
+        assert sorted(found) == [1, 2]
+        assert await cache.get(99) is None
+        assert not await cache.exists(99)
+        assert (await cache.get(2)).name == "u2"
+
+    asyncio.run(go())
+    assert repo.calls == [[1, 2, 99]]
+
+
+def test_least_recently_used_is_evicted():
+    repo = FakeRepo({u: row(u, f"u{u}") for u in (1, 2, 3)})
+    cache = ProfileCache(repo, capacity=2)
+
+    async def go():
+        await cache.get(1)
+        await cache.get(2)
+        await cache.get(1)
+        await cache.get(3)
+        assert len(cache) == 2
+        await cache.get(1)
+        await cache.get(2)
+
+    asyncio.run(go())
+    assert repo.calls == [[1], [2], [3], [2]]
+
+
+def test_load_overlapping_a_write_is_not_cached():
+    repo = FakeRepo({1: row(1, "old")})
+    cache = ProfileCache(repo)
+
+    async def go():
+        repo.gate = asyncio.Event()
+        load = asyncio.create_task(cache.get(1))
+        await asyncio.sleep(0)
+        cache.put(Profile(1, "new"))
+        repo.gate.set()
+        assert (await load).name == "old"
+        assert (await cache.get(1)).name == "new"
+
+        cache.invalidate(1)
+        repo.gate = None
+        repo.rows[1] = row(1, "newest")
+        assert (await cache.get(1)).name == "newest"
+
+    asyncio.run(go())
+    assert repo.calls == [[1], [1]]
+
+
+def test_entries_expire_after_max_age():
+    repo = FakeRepo({})
+    cache = ProfileCache(repo, max_age=0)
+
+    async def go():
+        assert await cache.get(1) is None
+        repo.rows[1] = row(1, "late")
+        await asyncio.sleep(0.01)
+        assert (await cache.get(1)).name == "late"
+
+    asyncio.run(go())
@@ -0,0 +1,40 @@
+from telegram import Update
+
+from bench import Updates
+from router import CommandRouter
+
+
+async def start(update, context):
+    pass
+
+
+async def menu(update, context):
+    pass
+
+
+def router():
+    r = CommandRouter(fallback=menu)
+    r.add_all({"start": start, "menu": menu})
+    r.alias(("help", "Settings"), menu)
+    return r
+
+
+def test_resolve():
+    r = router()
+    assert r.resolve("/start", "bot") == (start, [])
+    assert r.resolve("/START@Bot a b", "bot") == (start, ["a", "b"])
+    assert r.resolve("/settings", "bot") == (menu, [])
+    assert r.resolve("/unknown", "bot") == (menu, [])
+    assert r.resolve("/start@other_bot", "bot") is None
+    assert r.resolve("hello", "bot") is None
+
+
+def test_handler_ignores_channel_posts():
+    handler = router().handler()
+    message = Updates().message(42, "/start")
+    assert handler.check_update(Update.de_json(message, None))
+
+    channel = dict(message["message"], chat={"id": -100, "type": "channel"})
+    del channel["from"]
+    post = Update.de_json({"update_id": 2, "channel_post": channel}, None)
+    assert not handler.check_update(post)
@@ -0,0 +1,59 @@
+from scoring import FEMALE, MALE, ScoringEngine
+
+
+def engine():
+    scorer = ScoringEngine({"noise": 0}, seed=0)
+    scorer.upsert(1, 30, "m", "Paris", "hiking and coffee")
+    scorer.upsert(2, 29, "f", "Paris", "coffee and hiking")
+    scorer.upsert(3, 31, "m", "Oslo", "chess")
+    scorer.upsert(4, listed=False)
+    return scorer
+
+
+def test_top_k_skips_self_unlisted_and_excluded():
+    scorer = engine()
+    assert scorer.top_k(1, 10) == [2, 3]
+    assert scorer.top_k(1, 10, exclude=[2]) == [3]
+    assert 4 not in scorer.top_k(99, 10)
+
+
+def test_reload_replays_upserts_and_likes():
+    scorer = engine()
+    scorer.begin_reload()
+    rows = [(1, 30, "m", "Paris", ""), (2, 29, "f", "Paris", ""),
+            (3, 31, "m", "Oslo", "")]
+    scorer.upsert(5, 28, "f", "Paris", "coffee")
+    scorer.liked(1, 2)
+    scorer.finish_reload(scorer.build(rows))
+
+    assert 5 in scorer.top_k(1, 10)
+    state = scorer._state
+    assert state.liked_genders[state.rows[1], FEMALE] == 1
+    assert state.liked_genders[state.rows[1], MALE] == 0
+    assert scorer._journal is None
+
+
+def test_reload_during_top_k_keeps_exclusions():
+    scorer = engine()
+    # Same users in a different row order.
+    fresh = scorer.build([(4, None, None, None, None, False),
+                          (3, 31, "m", "Oslo", "chess"),
+                          (2, 29, "f", "Paris", "coffee and hiking"),
+                          (1, 30, "m", "Paris", "hiking and coffee")])
+    score = scorer._scores
+
+    def reload_midway(state, user_id):
+        result = score(state, user_id)
+        scorer.finish_reload(fresh)
+        return result
+
+    scorer._scores = reload_midway
+    assert scorer.top_k(1, 10, exclude=[2]) == [3]
+
+
+def test_arrays_grow_past_capacity():
+    scorer = ScoringEngine({"noise": 0}, capacity=2)
+    for user_id in range(1, 6):
+        scorer.upsert(user_id, 30, "f", "Paris", "coffee")
+    assert len(scorer) == 5
+    assert sorted(scorer.top_k(1, 10)) == [2, 3, 4, 5]
@@ -0,0 +1,108 @@
+import asyncio
+
+import search
+from db import Repository
+from profiles import ProfileCache
+from search import PEOPLE, POSTS, Search, fts_query, save_query, saved_query
+from writer import WriteBehind
+
+
+def test_fts_query_quotes_terms():
+    assert fts_query("AND OR \"(") == '"and"* "or"*'
+    assert fts_query("a music") == '"a" "music"*'
+    assert fts_query("  !? ") is None
+
+
+def test_saved_queries_keep_older_searches_pageable():
+    user_data = {}
+    first = save_query(user_data, POSTS, "music")
+    second = save_query(user_data, PEOPLE, "chess")
+    assert first != second
+    assert saved_query(user_data, first) == (POSTS, "music")
+    assert saved_query(user_data, second) == (PEOPLE, "chess")
+
+    for n in range(search.SAVED_QUERIES):
+        save_query(user_data, POSTS, f"term{n}")
+    assert saved_query(user_data, first) is None
+    assert len(user_data["searches"]) == search.SAVED_QUERIES
+    assert saved_query({}, 1) is None
+
+
+# ---------------- DATABASE ----------------
+def more_button(markup):
+    for row in markup.inline_keyboard:
+        for button in row:
+            if button.callback_data.startswith("search_"):
+                return button.callback_data
+    return None
+
+
+def test_paging_through_tied_ranks(database):
+    async def go():
+        writer = WriteBehind(database)
+        repo = Repository(database, writer)
+        try:
+            await repo.create_user(1)
+            post_ids = [await repo.add_post(1, f"music night {n:02}")
+                        for n in range(12)]
+
+            # The term is in every post, so every row has the same rank.
+            match = fts_query("music")
+            rows = await repo.search_posts(match, limit=100)
+            assert len({rank for _, rank, _, _ in rows}) == 1
+
+            seen, after = [], None
+            while True:
+                page = await repo.search_posts(match, after, limit=5)
+                if not page:
+                    break
+                seen += [post_id for post_id, _, _, _ in page]
+                after = (page[-1][1], page[-1][0])
+            assert seen == sorted(post_ids)
+
+            # The same walk through the More buttons.
+            searcher = Search(repo, ProfileCache(repo), page_size=5)
+            texts, after = [], None
+            while True:
+                text, markup = await searcher.page(POSTS, "music", after, 1)
+                texts += [line for line in text.splitlines()
+                          if line.startswith("music night")]
+                data = more_button(markup)
+                if data is None:
+                    break
+                _, query_id, rank, rowid = data.split("_")
+                assert query_id == "1"
+                after = (float(rank), int(rowid))
+            assert texts == [f"music night {n:02}" for n in range(12)]
+        finally:
+            await writer.close()
+
+    asyncio.run(go())
+
+
+def test_index_follows_inserts_and_updates(database):
+    async def go():
+        writer = WriteBehind(database)
+        repo = Repository(database, writer)
+        people = lambda text: repo.search_people(fts_query(text))
+        posts = lambda text: repo.search_posts(fts_query(text))
+        try:
+            await repo.create_user(1)
+            await repo.update_profile(1, "Ann", 30, "f", "Oslo", "plays chess")
+            assert [uid for uid, _ in await people("chess")] == [1]
+
+            await repo.update_profile(1, "Ann", 30, "f", "Oslo", "loves jazz")
+            assert await people("chess") == []
+            assert [uid for uid, _ in await people("jazz")] == [1]
+
+            post_id = await repo.add_post(1, "first draft")
+            await writer.execute(
+                "UPDATE posts SET content = ? WHERE post_id = ?",
+                ("final version", post_id),
+            )
+            assert await posts("draft") == []
+            assert [row[0] for row in await posts("final")] == [post_id]
+        finally:
+            await writer.close()
+
+    asyncio.run(go())
@@ -0,0 +1,107 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from telegram.error import NetworkError, RetryAfter
+
+from sender import INTERACTIVE, NOTIFICATION, SendScheduler
+
+
+class FakeBot:
+    """Records each send_message call and raises the queued failures first."""
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.calls = []
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls.append((chat_id, text))
+        await asyncio.sleep(0)
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append((chat_id, text))
+        return text
+
+
+def scheduler(bot):
+    return SendScheduler(bot, global_rate=1000, chat_rate=1000,
+                         chat_burst=1000)
+
+
+def delivered(bot, chat_id):
+    return [part for chat, text in bot.sent if chat == chat_id
+            for part in text.split("\n\n")]
+
+
+def test_consecutive_messages_are_coalesced():
+    async def go():
+        bot = FakeBot()
+        sender = scheduler(bot)
+        futures = [sender.send(1, text) for text in "abc"]
+        assert sender.depth == 3
+        await asyncio.gather(*futures)
+        assert sender.depth == 0
+        await sender.close()
+        return bot
+
+    bot = asyncio.run(go())
+    assert bot.sent == [(1, "a\n\nb\n\nc")]
+
+
+def test_priority_then_fifo():
+    async def go():
+        bot = FakeBot()
+        sender = scheduler(bot)
+        futures = [
+            sender.send(1, "n1", NOTIFICATION),
+            sender.send(2, "i1", INTERACTIVE),
+            sender.send(3, "n2", NOTIFICATION),
+            sender.send(4, "i2", INTERACTIVE),
+        ]
+        await asyncio.gather(*futures)
+        await sender.close()
+        return bot
+
+    bot = asyncio.run(go())
+    assert [text for _, text in bot.calls] == ["i1", "i2", "n1", "n2"]
+
+
+# Telegram reports whole seconds; a timedelta keeps the test fast.
+@pytest.mark.filterwarnings("ignore::telegram.warnings.PTBDeprecationWarning")
+def test_requeued_messages_are_delivered_once_in_order():
+    async def go():
+        bot = FakeBot([RetryAfter(timedelta(milliseconds=20)),
+                       RetryAfter(timedelta(milliseconds=20))])
+        sender = scheduler(bot)
+        futures = [sender.send(1, text) for text in ("a", "b", "c")]
+        futures.append(sender.send(2, "x"))
+        # Queued while the first batch is blocked by the flood limit.
+        await asyncio.sleep(0.01)
+        futures += [sender.send(1, text) for text in ("d", "e")]
+        results = await asyncio.gather(*futures)
+        assert sender.depth == 0
+        assert all(msg.done for msg in sender._heap)
+        await sender.close()
+        return bot, results
+
+    bot, results = asyncio.run(go())
+    assert delivered(bot, 1) == ["a", "b", "c", "d", "e"]
+    assert delivered(bot, 2) == ["x"]
+    assert len(bot.calls) == len(bot.sent) + 2
+    assert all(result is not None for result in results)
+
+
+def test_network_errors_back_off_and_retry():
+    async def go():
+        bot = FakeBot([NetworkError("reset")])
+        sender = scheduler(bot)
+        futures = [sender.send(1, "a"), sender.send(1, "b")]
+        await asyncio.gather(*futures)
+        assert sender.depth == 0
+        await sender.close()
+        return bot
+
+    bot = asyncio.run(go())
+    assert bot.calls == [(1, "a\n\nb"), (1, "a\n\nb")]
+    assert bot.sent == [(1, "a\n\nb")]
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+import config
+import webhook
+from bench import FakeRequest, Updates
+
+
+class ListQueue(list):
+    put = list.append
+
+
+def front(workers=3, secret=None, alive=None):
+    return webhook.WebhookFront(
+        [ListQueue() for _ in range(workers)], "/telegram", secret, alive
+    )
+
+
+# ---------------- ROUTING ----------------
+def test_hash_ring_is_stable_and_spreads_keys():
+    ring = webhook.HashRing(range(4))
+    nodes = [ring.node(user) for user in range(4000)]
+    assert nodes == [webhook.HashRing(range(4)).node(u) for u in range(4000)]
+    assert all(nodes.count(n) > 500 for n in range(4))
+
+    # Adding a node only moves keys onto the new node.
+    grown = webhook.HashRing(range(5))
+    for user, node in enumerate(nodes):
+        assert grown.node(user) in (node, 4)
+
+
+def test_routing_key():
+    updates = Updates()
+    assert webhook.routing_key(updates.message(42, "/start")) == 42
+    assert webhook.routing_key(updates.callback(7, "pass")) == 7
+    channel = {"update_id": 9, "channel_post": {"chat": {"id": -100}}}
+    assert webhook.routing_key(channel) == -100
+    assert webhook.routing_key({"update_id": 5}) == 5
+
+
+# ---------------- FRONT END ----------------
+def test_dispatch_status_codes():
+    f = front(secret="s3cret")
+    body = json.dumps(Updates().message(42, "hi")).encode()
+    ok = {webhook.SECRET_HEADER: "s3cret"}
+    assert f.dispatch("GET", "/healthz", {}, b"") == 200
+    assert f.dispatch("POST", "/other", ok, body) == 404
+    assert f.dispatch("GET", "/telegram", ok, b"") == 404
+    assert f.dispatch("POST", "/telegram", {}, body) == 403
+    assert f.dispatch("POST", "/telegram", ok, b"{nope") == 400
+    assert f.dispatch("POST", "/telegram", ok, b"[1]") == 400
+    assert f.dispatch("POST", "/telegram", ok, body) == 200
+    assert f.queues[f.ring.node(42)] == [body]
+
+
+def test_dispatch_rejects_updates_for_dead_workers():
+    f = front(alive=lambda index: False)
+    body = json.dumps(Updates().message(42, "hi")).encode()
+    assert f.dispatch("POST", "/telegram", {}, body) == 503
+    assert not any(f.queues)
+
+
+def test_bad_content_length_is_a_400():
+    async def request(raw):
+        f = front()
+        server = await asyncio.start_server(f.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(raw)
+            status = await reader.readline()
+            writer.close()
+        return status
+
+    for length in (b"abc", b"-5"):
+        raw = b"POST /telegram HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n"
+        assert asyncio.run(request(raw)).startswith(b"HTTP/1.1 400")
+
+
+def test_dead_workers_are_restarted():
+    class FakeProcess:
+        def __init__(self, target, args, name):
+            self.name = name
+            self.exitcode = None
+            self.started = False
+
+        def start(self):
+            self.started = True
+
+        def is_alive(self):
+            return self.started and self.exitcode is None
+
+    class FakeQueue:
+        def cancel_join_thread(self):
+            pass
+
+        def close(self):
+            self.closed = True
+
+    class Context:
+        Process = FakeProcess
+        Queue = FakeQueue
+
+    queues = [FakeQueue(), FakeQueue()]
+    first, second = queues
+    pool = webhook.Workers(Context(), queues, ())
+    pool.start(0)
+    pool.start(1)
+    dead = pool.processes[1]
+    dead.exitcode = 1
+    assert not pool.alive(1)
+    pool.restart_dead()
+    assert pool.alive(1) and pool.processes[1] is not dead
+    assert pool.processes[0].exitcode is None
+    assert queues[0] is first
+    assert queues[1] is not second and second.closed
+
+
+def test_restart_after_a_hard_kill_gets_a_working_queue(monkeypatch):
+    ctx = multiprocessing.get_context("fork")
+    received = ctx.Queue()
+
+    def reader(index, updates):
+        while True:
+            try:
+                received.put(updates.get(True, 1.0))
+            except queue.Empty:
+                pass
+
+    # fork, so the child runs this reader instead of the bot.
+    monkeypatch.setattr(webhook, "_worker_main", reader)
+    queues = [ctx.Queue()]
+    f = webhook.WebhookFront(queues, "/telegram")
+    pool = webhook.Workers(ctx, queues, ())
+    pool.start(0)
+    try:
+        # Killed while blocked in get(), holding the queue's read lock.
+        time.sleep(0.5)
+        os.kill(pool.processes[0].pid, signal.SIGKILL)
+        pool.processes[0].join()
+        pool.restart_dead()
+
+        body = json.dumps(Updates().message(42, "hi")).encode()
+        assert f.dispatch("POST", "/telegram", {}, body) == 200
+        assert received.get(timeout=5) == body
+    finally:
+        for process in pool.processes:
+            process.kill()
+            process.join()
+
+
+# ---------------- WORKER ----------------
+def test_worker_survives_malformed_updates(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "bot.db"))
+    import main
+
+    fake = FakeRequest()
+    app = main.build_app(request=fake)
+    updates = queue.Queue()
+    for body in (
+        {},
+        {"update_id": 1, "message": {"text": "hi"}},
+        Updates().message(42, "/start"),
+    ):
+        updates.put(json.dumps(body).encode())
+    updates.put(b"not json")
+    updates.put(json.dumps(Updates().message(43, "/menu")).encode())
+    updates.put(None)
+
+    asyncio.run(webhook._run_worker(app, updates))
+    assert fake.calls.get("sendMessage", 0) >= 2
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from writer import WriteBehind
+
+INSERT = "INSERT INTO users (user_id) VALUES (?)"
+USERS = "SELECT user_id FROM users ORDER BY user_id"
+
+
+def test_failing_op_only_fails_its_own_future(database):
+    def insert_then_fail(conn, user_id):
+        conn.execute(INSERT, (user_id,))
+        raise ValueError("boom")
+
+    async def go():
+        writer = WriteBehind(database, max_delay=0.05)
+        commit = writer._commit
+        batches = []
+        writer._commit = lambda ops: batches.append(len(ops)) or commit(ops)
+        results = await asyncio.gather(
+            writer.execute(INSERT, (1,)),
+            writer.run(insert_then_fail, 2),
+            writer.execute(INSERT, (3,)),
+            return_exceptions=True,
+        )
+        await writer.close()
+        return batches, results
+
+    batches, results = asyncio.run(go())
+    assert batches == [3]
+    assert isinstance(results[1], ValueError)
+    assert not isinstance(results[0], Exception)
+    assert not isinstance(results[2], Exception)
+    assert asyncio.run(database.fetchall(USERS)) == [(1,), (3,)]
+
+
+def test_close_flushes_queued_writes(database):
+    async def go():
+        writer = WriteBehind(database, max_batch=4)
+        insert = lambda conn, user_id: conn.execute(INSERT, (user_id,))
+        futures = [writer.submit(insert, i) for i in range(10)]
+        await writer.close()
+        assert all(f.done() and not f.exception() for f in futures)
+        with pytest.raises(RuntimeError):
+            writer.submit(lambda conn: None)
+
+    asyncio.run(go())
+    assert len(asyncio.run(database.fetchall(USERS))) == 10
+
+
+def test_read_after_write_sees_it(database):
+    async def go():
+        writer = WriteBehind(database)
+        try:
+            for user_id in range(1, 6):
+                await writer.execute(INSERT, (user_id,))
+                row = await database.fetchone(
+                    "SELECT user_id FROM users WHERE user_id = ?", (user_id,)
+                )
+                assert row == (user_id,)
+        finally:
+            await writer.close()
+
+    asyncio.run(go())
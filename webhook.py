@@ -0,0 +1,340 @@
+"""Webhook serving mode: one HTTP front end, N bot worker processes.
+
+    python webhook.py --workers 4 --port 8443 --url https://example.com/telegram
+
+The front end accepts Telegram's webhook POSTs and forwards each update
+to a worker chosen by a consistent hash of the sending user's id. A user
+always lands on the same worker, so updates from one user stay in order
+and ``context.user_data``, discover decks and the other per-process
+caches stay local. A worker that dies is restarted, and until then its
+users' updates are answered with 503 so Telegram retries them. On
+SIGTERM/SIGINT the front end stops accepting requests and every worker
+finishes the updates it already holds before it exits.
+"""
+import argparse
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import queue as queue_module
+import signal
+
+import config
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY = 1 << 20
+# How often the front end checks for dead workers, in seconds.
+WATCH_INTERVAL = 1.0
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+REASONS = {
+    200: "OK", 400: "Bad Request", 403: "Forbidden",
+    404: "Not Found", 413: "Payload Too Large", 503: "Service Unavailable",
+}
+
+
+# ---------------- ROUTING ----------------
+def _hash(key):
+    digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes."""
+
+    def __init__(self, nodes, replicas=64):
+        ring = sorted(
+            (_hash(f"{node}:{i}"), node) for node in nodes for i in range(replicas)
+        )
+        self._keys = [h for h, _ in ring]
+        self._nodes = [node for _, node in ring]
+
+    def node(self, key):
+        i = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._nodes[i]
+
+
+def routing_key(data):
+    """The user an update belongs to, falling back to its chat or its id."""
+    for field, value in data.items():
+        if field == "update_id" or not isinstance(value, dict):
+            continue
+        user = value.get("from") or value.get("user")
+        if user and "id" in user:
+            return user["id"]
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if chat and "id" in chat:
+            return chat["id"]
+    return data.get("update_id", 0)
+
+
+# ---------------- FRONT END ----------------
+class WebhookFront:
+    """Routes webhook POSTs to worker queues.
+
+    When ``alive(index)`` says a worker is down, its updates get a 503,
+    so Telegram retries them once the worker has been restarted.
+    """
+
+    def __init__(self, queues, path, secret=None, alive=None):
+        self.queues = queues
+        self.path = path
+        self.secret = secret
+        self.alive = alive
+        self.ring = HashRing(range(len(queues)))
+        self._connections = set()
+
+    def dispatch(self, method, target, headers, body):
+        if method == "GET" and target == "/healthz":
+            return 200
+        if target.split("?", 1)[0] != self.path:
+            return 404
+        if method != "POST":
+            return 404
+        if self.secret and headers.get(SECRET_HEADER) != self.secret:
+            return 403
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return 400
+        if not isinstance(data, dict):
+            return 400
+        node = self.ring.node(routing_key(data))
+        if self.alive is not None and not self.alive(node):
+            return 503
+        self.queues[node].put(body)
+        return 200
+
+    async def handle(self, reader, writer):
+        self._connections.add(writer)
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                        ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, _ = lines[0].split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                keep_alive = headers.get("connection", "").lower() != "close"
+                if length < 0:
+                    status, keep_alive = 400, False
+                elif length > MAX_BODY:
+                    status, keep_alive = 413, False
+                else:
+                    try:
+                        body = await reader.readexactly(length)
+                    except (asyncio.IncompleteReadError, ConnectionError):
+                        break
+                    status = self.dispatch(method, target, headers, body)
+
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Length: 0\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                    f"\r\n".encode()
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    def close_connections(self):
+        for writer in list(self._connections):
+            writer.close()
+
+
+async def _set_webhook(url, secret):
+    from telegram import Bot
+
+    async with Bot(config.TOKEN, base_url=config.API_URL) as bot:
+        await bot.set_webhook(url, secret_token=secret)
+    logger.info("Webhook set to %s", url)
+
+
+async def _serve_front(front, host, port, url=None, workers=None):
+    server = await asyncio.start_server(front.handle, host, port)
+    logger.info("Listening on %s:%d%s", host, port, front.path)
+    if url:
+        await _set_webhook(url, front.secret)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    async with server:
+        while not stop.is_set():
+            if workers is not None:
+                workers.restart_dead()
+            try:
+                await asyncio.wait_for(stop.wait(), WATCH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+        logger.info("Draining: no longer accepting updates")
+        server.close()
+        front.close_connections()
+
+
+# ---------------- WORKERS ----------------
+def _worker_main(index, updates, feed_max_age, profile_max_age, score_reload):
+    # Only the front end reacts to signals; workers exit once drained.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    logging.basicConfig(
+        format=f"%(asctime)s worker-{index} %(name)s %(levelname)s %(message)s",
+        level=logging.INFO,
+    )
+    if config.METRICS_PORT:
+        # Each worker serves its own metrics, on consecutive ports.
+        config.METRICS_PORT += index
+    import main
+
+    # Other workers write posts and profiles this process never hears about.
+    main.news_feed.max_age = feed_max_age
+    main.profiles.max_age = profile_max_age
+    main.searcher.max_age = feed_max_age
+    main.score_reload_interval = score_reload
+    asyncio.run(_run_worker(main.build_app(), updates))
+
+
+async def _run_worker(app, updates):
+    from telegram import Update
+
+    loop = asyncio.get_running_loop()
+    parent = multiprocessing.parent_process()
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+    try:
+        while True:
+            try:
+                body = await loop.run_in_executor(None, updates.get, True, 1.0)
+            except queue_module.Empty:
+                if parent is not None and not parent.is_alive():
+                    break
+                continue
+            if body is None:
+                break
+            try:
+                update = Update.de_json(json.loads(body), app.bot)
+            except Exception:
+                logger.exception("Dropping malformed update: %.200r", body)
+                continue
+            await app.update_queue.put(update)
+    finally:
+        # stop() processes everything already in update_queue first;
+        # post_stop then flushes outgoing messages and pending writes.
+        await app.stop()
+        if app.post_stop:
+            await app.post_stop(app)
+        await app.shutdown()
+
+
+class Workers:
+    """The worker processes, one per queue, restarted when one dies.
+
+    ``queues`` is shared with the front end, which sees the fresh queue
+    a restarted worker reads from.
+    """
+
+    def __init__(self, ctx, queues, args):
+        self.ctx = ctx
+        self.queues = queues
+        self.args = args
+        self.processes = [None] * len(queues)
+
+    def start(self, index):
+        process = self.ctx.Process(
+            target=_worker_main, args=(index, self.queues[index]) + self.args,
+            name=f"bot-worker-{index}"
+        )
+        process.start()
+        self.processes[index] = process
+
+    def alive(self, index):
+        process = self.processes[index]
+        return process is not None and process.is_alive()
+
+    def restart_dead(self):
+        for index, process in enumerate(self.processes):
+            if not process.is_alive():
+                logger.error("%s exited with code %s, restarting",
+                             process.name, process.exitcode)
+                # A worker killed inside get() never releases the queue's
+                # read lock, so its replacement gets a new queue. Updates
+                # still on the old one are lost.
+                old = self.queues[index]
+                self.queues[index] = self.ctx.Queue()
+                old.cancel_join_thread()
+                old.close()
+                self.start(index)
+
+    def stop(self, drain_timeout):
+        for q in self.queues:
+            q.put(None)
+        for process in self.processes:
+            process.join(drain_timeout)
+            if process.is_alive():
+                logger.warning("%s did not drain in time", process.name)
+                process.terminate()
+
+
+def serve(workers, host="0.0.0.0", port=8443, path="/telegram", secret=None,
+          url=None, feed_max_age=2.0, profile_max_age=60.0, score_reload=300.0,
+          drain_timeout=30.0):
+    ctx = multiprocessing.get_context("spawn")
+    queues = [ctx.Queue() for _ in range(workers)]
+    pool = Workers(ctx, queues, (feed_max_age, profile_max_age, score_reload))
+    for index in range(workers):
+        pool.start(index)
+
+    front = WebhookFront(queues, path, secret, alive=pool.alive)
+    try:
+        asyncio.run(_serve_front(front, host, port, url, pool))
+    finally:
+        pool.stop(drain_timeout)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--path", default="/telegram")
+    parser.add_argument("--url", help="public webhook URL to register with Telegram")
+    parser.add_argument("--secret", default=os.environ.get("WEBHOOK_SECRET"))
+    parser.add_argument("--feed-max-age", type=float, default=2.0)
+    parser.add_argument("--profile-max-age", type=float, default=60.0)
+    parser.add_argument("--score-reload", type=float, default=300.0,
+                        help="seconds between reloads of the scoring engine")
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format="%(asctime)s front %(name)s %(levelname)s %(message)s",
+        level=logging.INFO,
+    )
+    serve(
+        args.workers, args.host, args.port, args.path, args.secret,
+        args.url, args.feed_max_age, args.profile_max_age, args.score_reload,
+        args.drain_timeout
+    )
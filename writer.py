@@ -0,0 +1,153 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriteBehind:
+    """Single writer that group-commits queued mutations.
+
+    Handlers submit ``fn(conn, *args)`` callables. The writer task drains
+    the queue into batches of up to ``max_batch`` operations or
+    ``max_delay`` seconds, runs each batch in one transaction on its own
+    thread and connection, and resolves every submitter's future with its
+    result only after COMMIT. Awaiting a write is therefore a durability
+    acknowledgement, and reads issued afterwards see it. Each operation
+    runs under a savepoint so one failing write does not sink its batch.
+    """
+
+    def __init__(self, db, max_batch=256, max_delay=0.005, synchronous="FULL"):
+        self.db = db
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.synchronous = synchronous
+        self._queue = asyncio.Queue()
+        self._task = None
+        self._closed = False
+        self._conn = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="db-writer"
+        )
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def submit(self, fn, *args):
+        """Queue ``fn(conn, *args)``; return a future for its committed result."""
+        if self._closed:
+            raise RuntimeError("writer is closed")
+        loop = asyncio.get_running_loop()
+        if self._task is None:
+            self._task = loop.create_task(self._run())
+        future = loop.create_future()
+        self._queue.put_nowait((fn, args, future))
+        return future
+
+    async def run(self, fn, *args):
+        return await self.submit(fn, *args)
+
+    async def execute(self, sql, params=()):
+        return await self.submit(_execute, sql, params)
+
+    async def close(self):
+        """Stop accepting writes, flush everything queued, then stop."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._task is not None:
+            self._queue.put_nowait(_STOP)
+            await self._task
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._disconnect)
+        self._executor.shutdown(wait=True)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    if self._queue.empty():
+                        timeout = deadline - loop.time()
+                        if timeout <= 0:
+                            break
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    else:
+                        item = self._queue.get_nowait()
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            ops = [(fn, args) for fn, args, _ in batch]
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self._commit, ops
+                )
+            except Exception as e:
+                logger.exception("Write batch of %d failed", len(batch))
+                results = [(False, e)] * len(batch)
+            for (_, _, future), (ok, value) in zip(batch, results):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    # Runs on the writer thread only.
+    def _connection(self):
+        if self._conn is None:
+            conn = self.db.connect()
+            conn.isolation_level = None
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            self._conn = conn
+        return self._conn
+
+    def _commit(self, ops):
+        conn = self._connection()
+        results = []
+        start = perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for fn, args in ops:
+                conn.execute("SAVEPOINT op")
+                try:
+                    result = fn(conn, *args)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO op")
+                    results.append((False, e))
+                else:
+                    results.append((True, result))
+                conn.execute("RELEASE op")
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        metrics.write_batch_size.observe(len(ops))
+        metrics.commit_seconds.observe(perf_counter() - start)
+        return results
+
+    def _disconnect(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def _execute(conn, sql, params):
+    return conn.execute(sql, params).lastrowid